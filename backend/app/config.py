@@ -2,6 +2,11 @@ import os
 from typing import Optional
 from pydantic import model_validator
 from pydantic_settings import BaseSettings
+from sqlalchemy.engine import make_url
+
+# Drivers create_async_engine accepts, and the one used for each backend when DATABASE_URL names a sync one
+ASYNC_DRIVERS = {"aiosqlite", "asyncpg", "psycopg", "aiomysql", "asyncmy"}
+ASYNC_DRIVER_FOR = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg"}
 
 class Settings(BaseSettings):
     APP_NAME: str = "MEDCLARE"
@@ -9,11 +14,67 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 480
     DATABASE_URL: Optional[str] = None
+    # Async driver URL for the pipeline and job workers; derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URL: Optional[str] = None
     UPLOAD_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
     OPENROUTER_API_KEY: Optional[str] = None
     OPENROUTER_MODEL: str = "google/gemini-2.0-flash-001"
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
     CHROMA_PERSIST_DIR: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "chroma_db")
+    # Shared OpenRouter connection pool
+    HTTP2_ENABLED: bool = True
+    HTTP_POOL_MAX_CONNECTIONS: int = 20
+    HTTP_POOL_MAX_KEEPALIVE: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    OCR_TIMEOUT: float = 60.0
+    CLASSIFICATION_TIMEOUT: float = 30.0
+    EXTRACTION_TIMEOUT: float = 60.0
+    EXPLANATION_TIMEOUT: float = 60.0
+    # Background pipeline job queue
+    JOB_WORKERS: int = 2
+    JOB_POLL_INTERVAL: float = 2.0
+    JOB_MAX_ATTEMPTS: int = 2
+    # A running job whose heartbeat is older than the lease is assumed orphaned and requeued
+    JOB_HEARTBEAT_INTERVAL: float = 15.0
+    JOB_LEASE_SECONDS: float = 90.0
+    # Start lab and prescription extraction alongside classification; the loser is cancelled
+    SPECULATIVE_EXTRACTION: bool = True
+    # Lab extraction: "llm" always calls the model, "deterministic_first" only on low regex coverage
+    EXTRACTION_MODE: str = "deterministic_first"
+    EXTRACTION_COVERAGE_THRESHOLD: float = 0.9
+    EXTRACTION_MAX_UNKNOWN_ROWS: int = 0
+    # Evidence cache keyed by normalised finding signature
+    RETRIEVAL_CACHE_SIZE: int = 2048
+    RETRIEVAL_CACHE_TTL: float = 6 * 3600
+    # Content-addressed OCR cache
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_MAX_BYTES: int = 50 * 1024 * 1024
+    # OCR engine: "cloud" (Gemini Vision) or "tesseract" (local, process pool). The fallback runs
+    # when the primary fails; "simulated" returns sample text for offline demos, "" disables it
+    OCR_ENGINE: str = "cloud"
+    OCR_FALLBACK_ENGINE: str = "tesseract"
+    OCR_LOCAL_WORKERS: int = 2
+    TESSERACT_LANG: str = "eng"
+    # Persistent explanation cache keyed on normalised findings, evidence, medications, level and lang
+    EXPLANATION_CACHE_ENABLED: bool = True
+    EXPLANATION_CACHE_MAX_BYTES: int = 50 * 1024 * 1024
+    EXPLANATION_CACHE_TTL: int = 7 * 24 * 3600
+    # Stream explanation tokens from the provider when a caller wants partial output (SSE clients)
+    EXPLANATION_STREAMING: bool = True
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+    # Multi-page PDFs are rendered per page (pdf2image) and transcribed concurrently
+    OCR_PDF_PAGE_SPLIT: bool = True
+    OCR_PAGE_CONCURRENCY: int = 8
+    OCR_PDF_DPI: int = 200
+    # Local image cleanup before the vision call: EXIF rotate, grayscale, deskew, crop, downscale
+    OCR_PREPROCESS: bool = True
+    OCR_IMAGE_MAX_DIM: int = 2048
+    OCR_IMAGE_FORMAT: str = "JPEG"  # JPEG | WEBP
+    OCR_IMAGE_QUALITY: int = 85
+    # Uploads are streamed to disk in chunks and rejected past this size
+    MAX_UPLOAD_BYTES: int = 25 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
 
     @model_validator(mode='after')
     def set_db_url(self):
@@ -21,6 +82,13 @@ class Settings(BaseSettings):
             # Default to local sqlite db in backend root
             root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             self.DATABASE_URL = f"sqlite:///{os.path.join(root, 'medclare.db')}"
+        if not self.ASYNC_DATABASE_URL:
+            # Same database through an asyncio driver; sync drivers (postgresql+psycopg2) are swapped
+            url = make_url(self.DATABASE_URL)
+            backend, _, driver = url.drivername.partition("+")
+            if driver not in ASYNC_DRIVERS and backend in ASYNC_DRIVER_FOR:
+                url = url.set(drivername=ASYNC_DRIVER_FOR[backend])
+            self.ASYNC_DATABASE_URL = url.render_as_string(hide_password=False)
         return self
 
     class Config:
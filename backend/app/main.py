@@ -1,15 +1,37 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
-from app.routers import auth, reports, verification, evaluation
+from app.database import engine, async_engine, Base
+from app.routers import auth, reports, verification, evaluation, jobs
 from app import models  # Ensure models are registered for create_all
+from app.migrations import run_migrations
+from app.services.http_client import init_http_client, close_http_client, get_http_stats
+from app.services.jobs import start_workers, stop_workers
+from app.services.ocr_engines import shutdown_ocr_engines
+from app.services.extraction import get_extraction_stats
+from app.services.explanation import get_explanation_cache_stats
+from app.services.rag import warm_knowledge_index, get_retrieval_stats
+from app.services.metrics import render_metrics
+from app.services.storage import RequestSizeLimitMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create all tables on startup
+    # Create all tables on startup, then bring older databases up to the current schema
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    # One pooled keep-alive client shared by every OpenRouter call
+    await init_http_client()
+    # Open the persistent knowledge index and load the embedding model before the first report
+    await asyncio.to_thread(warm_knowledge_index)
+    # Bounded worker pool draining the persistent pipeline job queue
+    await start_workers()
     yield
+    await stop_workers()
+    await close_http_client()
+    await async_engine.dispose()
+    shutdown_ocr_engines()
 
 app = FastAPI(
     title="MEDCLARE API",
@@ -24,12 +46,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Refuse oversized uploads before their multipart body is spooled to a temporary file
+app.add_middleware(RequestSizeLimitMiddleware)
 
 app.include_router(auth.router)
 app.include_router(reports.router)
 app.include_router(verification.router)
 app.include_router(evaluation.router)
+app.include_router(jobs.router)
 
 @app.get("/")
 def root():
@@ -43,3 +69,28 @@ def root():
 @app.get("/health")
 def health():
     return {"status": "healthy"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-stage wall/CPU time and LLM token and payload histograms for Prometheus to scrape."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/http")
+def http_pool_stats():
+    """Connection reuse and per-stage LLM latency for the shared HTTP pool."""
+    return get_http_stats()
+
+@app.get("/health/extraction")
+def extraction_stats():
+    """How often lab extraction was served by the deterministic extractor instead of the LLM."""
+    return get_extraction_stats()
+
+@app.get("/health/explanation")
+def explanation_stats():
+    """Explanation cache hit rate and stored size."""
+    return get_explanation_cache_stats()
+
+@app.get("/health/retrieval")
+def retrieval_stats():
+    """Evidence cache hit rate and retrieval latency."""
+    return get_retrieval_stats()
@@ -0,0 +1,102 @@
+"""Schema Migrations — ordered, idempotent upgrades for databases created by older versions.
+
+create_all only creates missing tables; columns and indexes added to existing tables are
+applied here. Each migration runs once and is recorded in schema_migrations. Every operation
+is safe to repeat, so a fresh database (already complete after create_all) simply records them.
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from app.database import engine as default_engine
+from app.models import SchemaMigration
+
+Operation = Callable[[Connection], None]
+
+def add_column(table: str, column: str, ddl: str) -> Operation:
+    def apply(conn: Connection):
+        inspector = inspect(conn)
+        if not inspector.has_table(table):
+            return  # created complete by create_all
+        if column in {c["name"] for c in inspector.get_columns(table)}:
+            return
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN "{column}" {ddl}'))
+        print(f"  added column {table}.{column}")
+    return apply
+
+def create_index(name: str, table: str, columns: str) -> Operation:
+    def apply(conn: Connection):
+        if not inspect(conn).has_table(table):
+            return
+        # CONCURRENTLY keeps Postgres tables writable while the index builds
+        concurrently = "CONCURRENTLY " if conn.dialect.name == "postgresql" else ""
+        conn.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({columns})"))
+        print(f"  index {name} ready")
+    return apply
+
+# (version, description, operations) — append only; never edit an applied entry
+MIGRATIONS: List[Tuple[int, str, List[Operation]]] = [
+    (1, "report language and pipeline checkpoints", [
+        add_column("reports", "lang", "VARCHAR DEFAULT 'en'"),
+        add_column("reports", "pipeline_checkpoints", "JSON"),
+    ]),
+    (2, "forced pipeline jobs", [
+        add_column("pipeline_jobs", "force", "BOOLEAN DEFAULT FALSE"),
+    ]),
+    (3, "keyset pagination indexes", [
+        create_index("ix_reports_patient_feed", "reports", "patient_id, is_deleted, created_at, id"),
+        create_index("ix_reports_review_queue", "reports", "review_requested, is_deleted, created_at, id"),
+        create_index("ix_evaluation_results_created", "evaluation_results", "created_at, id"),
+        create_index("ix_evaluation_results_report", "evaluation_results", "report_id, created_at"),
+    ]),
+    (4, "hot-path indexes for trends, report children and the job queue", [
+        create_index("ix_reports_patient_trends", "reports", "patient_id, report_type, status, created_at"),
+        create_index("ix_structured_findings_report_id", "structured_findings", "report_id"),
+        create_index("ix_medications_report_id", "medications", "report_id"),
+        create_index("ix_explanation_versions_report_version", "explanation_versions", "report_id, version"),
+        create_index("ix_audit_logs_report_created", "audit_logs", "report_id, created_at"),
+        create_index("ix_pipeline_jobs_claim", "pipeline_jobs", "status, priority DESC, created_at"),
+        create_index("ix_pipeline_jobs_report_status", "pipeline_jobs", "report_id, status"),
+    ]),
+    (5, "upload content hash and size", [
+        add_column("reports", "file_hash", "VARCHAR"),
+        add_column("reports", "file_size", "INTEGER"),
+        create_index("ix_reports_file_hash", "reports", "file_hash"),
+    ]),
+    (6, "duplicate upload links", [
+        add_column("reports", "duplicate_of", "VARCHAR REFERENCES reports(id)"),
+    ]),
+    (7, "precomputed personalization variants", [
+        add_column("reports", "explanation_variants", "JSON"),
+    ]),
+    (8, "optimistic locking for parameter series", [
+        add_column("patient_parameter_series", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ]),
+    (9, "job heartbeats for recovering jobs of stopped workers", [
+        add_column("pipeline_jobs", "heartbeat_at", "TIMESTAMP"),
+    ]),
+]
+
+def run_migrations(engine: Engine = default_engine) -> List[int]:
+    """Apply pending migrations in order and return the versions applied by this call."""
+    applied_now = []
+    # Autocommit: each DDL statement stands alone (required for CREATE INDEX CONCURRENTLY)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        SchemaMigration.__table__.create(conn, checkfirst=True)
+        migrations = SchemaMigration.__table__
+        done = set(conn.execute(select(migrations.c.version)).scalars())
+        for version, description, operations in MIGRATIONS:
+            if version in done:
+                continue
+            print(f"Applying migration {version}: {description}")
+            for operation in operations:
+                operation(conn)
+            try:
+                conn.execute(migrations.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()
+                ))
+                applied_now.append(version)
+            except IntegrityError:
+                pass  # another process recorded it first; every operation is idempotent
+    return applied_now
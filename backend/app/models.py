@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Float, Text, DateTime, ForeignKey, Enum, JSON, Integer, Boolean
+from sqlalchemy import Column, String, Float, Text, DateTime, ForeignKey, Enum, JSON, Integer, Boolean, Index, UniqueConstraint, desc
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -19,23 +19,35 @@ class User(Base):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        # Keyset-paginated listings: equality filters first, then the (created_at, id) sort key
+        Index("ix_reports_patient_feed", "patient_id", "is_deleted", "created_at", "id"),
+        Index("ix_reports_review_queue", "review_requested", "is_deleted", "created_at", "id"),
+        # Trend analysis counts and scans one patient's explained lab reports in date order
+        Index("ix_reports_patient_trends", "patient_id", "report_type", "status", "created_at"),
+    )
     id = Column(String, primary_key=True, default=gen_uuid)
     patient_id = Column(String, ForeignKey("users.id"), nullable=False)
     title = Column(String, nullable=False, default="Medical Report")
     file_path = Column(String, nullable=False)
     file_type = Column(String, nullable=False)
+    file_hash = Column(String, nullable=True, index=True)  # SHA-256 of the uploaded bytes
+    file_size = Column(Integer, nullable=True)
+    duplicate_of = Column(String, ForeignKey("reports.id"), nullable=True)  # report whose extraction was reused
     status = Column(String, nullable=False, default="uploaded")  # uploaded|processing|extracted|explained|verified|rejected
     ocr_text = Column(Text, nullable=True)
     ocr_confidence = Column(Float, nullable=True)
     extraction_json = Column(JSON, nullable=True)
     explanation_text = Column(Text, nullable=True)
     explanation_sections = Column(JSON, nullable=True)
+    explanation_variants = Column(JSON, nullable=True)  # level -> {explanation_text, sections}
     citations = Column(JSON, nullable=True)
     confidence_scores = Column(JSON, nullable=True)
     overall_confidence = Column(Float, nullable=True)
     guardrail_flags = Column(JSON, nullable=True)
     personalization_level = Column(String, default="standard")  # simple|standard|detailed
     reasoning_trace = Column(JSON, nullable=True)
+    pipeline_checkpoints = Column(JSON, nullable=True)  # stage -> input fingerprint (+ cached output)
     verified_by = Column(String, ForeignKey("users.id"), nullable=True)
     verified_at = Column(DateTime, nullable=True)
     verification_status = Column(String, nullable=True)  # approved|edited|rejected
@@ -56,7 +68,7 @@ class Report(Base):
 class StructuredFinding(Base):
     __tablename__ = "structured_findings"
     id = Column(String, primary_key=True, default=gen_uuid)
-    report_id = Column(String, ForeignKey("reports.id"), nullable=False)
+    report_id = Column(String, ForeignKey("reports.id"), nullable=False, index=True)
     test_name = Column(String, nullable=False)
     value = Column(String, nullable=False)
     unit = Column(String, nullable=True)
@@ -69,7 +81,7 @@ class StructuredFinding(Base):
 class Medication(Base):
     __tablename__ = "medications"
     id = Column(String, primary_key=True, default=gen_uuid)
-    report_id = Column(String, ForeignKey("reports.id"), nullable=False)
+    report_id = Column(String, ForeignKey("reports.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     dosage = Column(String, nullable=True)
     frequency = Column(String, nullable=True)
@@ -79,6 +91,7 @@ class Medication(Base):
 
 class ExplanationVersion(Base):
     __tablename__ = "explanation_versions"
+    __table_args__ = (Index("ix_explanation_versions_report_version", "report_id", "version"),)
     id = Column(String, primary_key=True, default=gen_uuid)
     report_id = Column(String, ForeignKey("reports.id"), nullable=False)
     version = Column(Integer, nullable=False, default=1)
@@ -91,6 +104,7 @@ class ExplanationVersion(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (Index("ix_audit_logs_report_created", "report_id", "created_at"),)
     id = Column(String, primary_key=True, default=gen_uuid)
     report_id = Column(String, ForeignKey("reports.id"), nullable=False)
     user_id = Column(String, ForeignKey("users.id"), nullable=True)
@@ -101,6 +115,10 @@ class AuditLog(Base):
 
 class EvaluationResult(Base):
     __tablename__ = "evaluation_results"
+    __table_args__ = (
+        Index("ix_evaluation_results_created", "created_at", "id"),
+        Index("ix_evaluation_results_report", "report_id", "created_at"),
+    )
     id = Column(String, primary_key=True, default=gen_uuid)
     report_id = Column(String, ForeignKey("reports.id"), nullable=False)
     completeness_score = Column(Float, nullable=False, default=0.0)
@@ -114,3 +132,69 @@ class EvaluationResult(Base):
     evaluated_by = Column(String, ForeignKey("users.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     report = relationship("Report")
+
+class PipelineJob(Base):
+    __tablename__ = "pipeline_jobs"
+    __table_args__ = (
+        # Matches the worker's claim order: priority DESC, created_at ASC
+        Index("ix_pipeline_jobs_claim", "status", desc("priority"), "created_at"),
+        Index("ix_pipeline_jobs_report_status", "report_id", "status"),
+    )
+    id = Column(String, primary_key=True, default=gen_uuid)
+    report_id = Column(String, ForeignKey("reports.id"), nullable=False)
+    requested_by = Column(String, ForeignKey("users.id"), nullable=True)
+    status = Column(String, nullable=False, default="queued")  # queued|running|completed|failed
+    priority = Column(Integer, nullable=False, default=0)  # higher runs first
+    personalization_level = Column(String, default="standard")
+    lang = Column(String, default="en")
+    force = Column(Boolean, default=False)  # ignore pipeline checkpoints
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed while running; a stale one means the worker is gone
+    finished_at = Column(DateTime, nullable=True)
+    report = relationship("Report")
+
+class CacheEntry(Base):
+    __tablename__ = "cache_entries"
+    key = Column(String, primary_key=True)  # namespace-prefixed content hash
+    namespace = Column(String, nullable=False, index=True)  # ocr|explanation
+    value = Column(JSON, nullable=False)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class PatientParameterSeries(Base):
+    """Denormalised time series of one canonical lab parameter for one patient."""
+    __tablename__ = "patient_parameter_series"
+    __table_args__ = (UniqueConstraint("patient_id", "parameter", name="uq_series_patient_parameter"),)
+    id = Column(String, primary_key=True, default=gen_uuid)
+    patient_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    parameter = Column(String, nullable=False)  # canonical test name
+    display_name = Column(String, nullable=False)  # test_name as last reported
+    points = Column(JSON, nullable=False, default=list)  # ordered by report date
+    numeric_count = Column(Integer, nullable=False, default=0)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+    sum_value = Column(Float, nullable=False, default=0.0)
+    version = Column(Integer, nullable=False, default=1)  # optimistic lock for concurrent pipeline runs
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __mapper_args__ = {"version_id_col": version}
+
+class StoredFile(Base):
+    """One row per distinct upload content; reports share it through file_hash."""
+    __tablename__ = "stored_files"
+    sha256 = Column(String, primary_key=True)
+    file_path = Column(String, nullable=False)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaMigration(Base):
+    """One row per applied entry of app.migrations.MIGRATIONS."""
+    __tablename__ = "schema_migrations"
+    version = Column(Integer, primary_key=True)
+    description = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -1,11 +1,13 @@
 """Evaluation Router — doctor-only evaluation endpoints."""
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User, Report, EvaluationResult, StructuredFinding
 from app.schemas import EvaluationOut, EvaluationRunRequest
 from app.auth import get_current_user, require_role
+from app.services.pagination import keyset_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter(prefix="/evaluation", tags=["Evaluation"])
 
@@ -69,16 +71,29 @@ def run_evaluation(
 
 @router.get("/benchmark", response_model=list[EvaluationOut])
 def get_benchmark(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    grade: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
     user: User = Depends(require_role("doctor")),
     db: Session = Depends(get_db)
 ):
-    """Get all evaluation results as a benchmark summary."""
-    results = (
-        db.query(EvaluationResult)
-        .order_by(EvaluationResult.created_at.desc())
-        .limit(50)
-        .all()
-    )
+    """Page through evaluation results, newest first; the next cursor is in the X-Next-Cursor header."""
+    query = db.query(EvaluationResult)
+    if grade:
+        query = query.filter(EvaluationResult.grade == grade)
+    if created_from:
+        query = query.filter(EvaluationResult.created_at >= created_from)
+    if created_to:
+        query = query.filter(EvaluationResult.created_at < created_to)
+    try:
+        results, next_cursor = keyset_page(query, EvaluationResult.created_at, EvaluationResult.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [EvaluationOut.model_validate(r) for r in results]
 
 
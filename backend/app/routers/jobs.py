@@ -0,0 +1,88 @@
+import asyncio
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import get_db, get_async_db, AsyncSessionLocal
+from app.models import User, PipelineJob, Report
+from app.schemas import JobOut
+from app.auth import get_current_user
+from app.services.events import subscribe, format_sse
+from app.services.jobs import queue_position
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+@router.get("/{job_id}", response_model=JobOut)
+def get_job(job_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    job = db.query(PipelineJob).filter(PipelineJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if user.role == "patient" and job.report.patient_id != user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    out = JobOut.model_validate(job)
+    out.queue_position = queue_position(db, job)
+    return out
+
+async def _job_snapshot(job_id: str) -> Optional[Dict]:
+    # Short session per read: the stream can stay open for minutes
+    async with AsyncSessionLocal() as db:
+        job = await db.get(PipelineJob, job_id)
+        if job is None:
+            return None
+        return {"job_id": job.id, "status": job.status, "attempts": job.attempts, "error": job.error}
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Server-Sent Events for one job: "job" status changes, a "stage" event as each pipeline stage
+    finishes, "explanation_summary" deltas and "explanation_section" objects while the
+    explanation streams, then "complete" or "error". The stream closes once the job is
+    completed or failed; connecting mid-run replays the stages already finished.
+    """
+    row = (await db.execute(
+        select(PipelineJob.report_id, Report.patient_id)
+        .join(Report, Report.id == PipelineJob.report_id)
+        .where(PipelineJob.id == job_id)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if user.role == "patient" and row.patient_id != user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    report_id = row.report_id
+
+    async def events():
+        async with subscribe(report_id, run_id=job_id) as queue:
+            # Read the status only after subscribing so a transition in between is not missed
+            snapshot = await _job_snapshot(job_id)
+            yield format_sse({"event": "job", "data": snapshot})
+            if snapshot is None or snapshot["status"] in TERMINAL_STATUSES:
+                return
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=settings.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # A job run by another process publishes nothing here; the stored status still ends the stream
+                    snapshot = await _job_snapshot(job_id)
+                    if snapshot is None or snapshot["status"] in TERMINAL_STATUSES:
+                        yield format_sse({"event": "job", "data": snapshot})
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(item)
+                data = item["data"] or {}
+                if item["event"] == "job" and data.get("job_id") == job_id and data.get("status") in TERMINAL_STATUSES:
+                    return
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+    })
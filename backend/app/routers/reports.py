@@ -1,74 +1,144 @@
 import os
-import uuid
-import shutil
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
-from sqlalchemy.orm import Session
-from app.database import get_db
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.database import get_db, get_async_db
 from app.models import User, Report
-from app.schemas import ReportOut, ReportListOut, ProcessRequest
+from app.schemas import ReportOut, ReportListOut, ProcessRequest, PersonalizationRequest, JobOut
 from app.auth import get_current_user
-from app.config import settings
+from app.services.pagination import keyset_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.storage import save_upload, retain_file, find_duplicate_report, UploadTooLargeError
+from app.services.orchestrator import link_duplicate
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
 ALLOWED_TYPES = {"application/pdf", "image/png", "image/jpeg", "image/jpg", "image/tiff"}
 ALLOWED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".tiff"}
 
-@router.post("/upload", response_model=ReportOut)
-async def upload_report(
-    file: UploadFile = File(...),
-    title: str = Form("Medical Report"),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    ext = os.path.splitext(file.filename)[1].lower()
-    if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed: {ALLOWED_EXTENSIONS}")
-    
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(settings.UPLOAD_DIR, f"{file_id}{ext}")
-    
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+def _register_upload(db: Session, patient_id: str, title: str, ext: str,
+                     file_path: str, file_hash: str, file_size: int) -> ReportOut:
+    file_path = retain_file(db, file_hash, file_path, file_size)
     
     report = Report(
-        patient_id=user.id,
+        patient_id=patient_id,
         title=title,
         file_path=file_path,
         file_type=ext.replace(".", ""),
+        file_hash=file_hash,
+        file_size=file_size,
         status="uploaded"
     )
+    # Re-uploads of the same bytes reuse the earlier OCR and extraction instead of recomputing them
+    source = find_duplicate_report(db, patient_id, file_hash)
+    if source:
+        link_duplicate(db, report, source)
     db.add(report)
     db.commit()
     db.refresh(report)
     return ReportOut.model_validate(report)
 
+@router.post("/upload", response_model=ReportOut)
+async def upload_report(
+    file: UploadFile = File(...),
+    title: str = Form("Medical Report"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    ext = os.path.splitext(file.filename)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed: {ALLOWED_EXTENSIONS}")
+    
+    try:
+        file_path, file_hash, file_size = await save_upload(file, ext)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    # The storage and duplicate helpers are sync; run_sync drives them over the async connection
+    return await db.run_sync(_register_upload, user.id, title, ext, file_path, file_hash, file_size)
+
+# Columns ReportListOut needs; selecting them directly skips hydrating JSON/text blobs per row
+_LIST_COLUMNS = (
+    Report.id, Report.title, Report.status, Report.file_type, Report.overall_confidence,
+    Report.verification_status, Report.review_requested, Report.created_at
+)
+
+def load_report_detail(db: Session, report_id: str) -> Optional[Report]:
+    """
+    Fetch a report with the collections ReportOut serialises in two queries: findings are
+    joined onto the report row, medications follow in one IN query (joining both would
+    multiply the rows by findings × medications).
+    """
+    return (
+        db.query(Report)
+        .options(joinedload(Report.findings), selectinload(Report.medications))
+        .filter(Report.id == report_id)
+        .first()
+    )
+
 @router.get("/", response_model=list[ReportListOut])
-def list_reports(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def list_reports(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    report_type: Optional[str] = None,
+    verification_status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Newest-first page of reports; the next page's cursor is returned in the X-Next-Cursor header.
+    status accepts a comma-separated list, e.g. "explained,verified,edited".
+    """
     if user.role == "doctor":
-        reports = db.query(Report).filter(Report.is_deleted == False, Report.review_requested == True).order_by(Report.created_at.desc()).all()
-        result = []
-        for r in reports:
-            out = ReportListOut.model_validate(r)
-            out.patient_name = r.patient.name if r.patient else "Unknown"
-            result.append(out)
-        return result
+        # Patient name comes from the same query instead of one lazy User load per report
+        query = (
+            db.query(*_LIST_COLUMNS, User.name.label("patient_name"))
+            .outerjoin(User, User.id == Report.patient_id)
+            .filter(Report.review_requested == True, Report.is_deleted == False)
+        )
     else:
-        reports = db.query(Report).filter(Report.patient_id == user.id, Report.is_deleted == False).order_by(Report.created_at.desc()).all()
-        return [ReportListOut.model_validate(r) for r in reports]
+        query = db.query(*_LIST_COLUMNS).filter(Report.patient_id == user.id, Report.is_deleted == False)
+
+    if status:
+        query = query.filter(Report.status.in_([s.strip() for s in status.split(",") if s.strip()]))
+    if report_type:
+        query = query.filter(Report.report_type == report_type)
+    if verification_status:
+        query = query.filter(Report.verification_status == verification_status)
+    if created_from:
+        query = query.filter(Report.created_at >= created_from)
+    if created_to:
+        query = query.filter(Report.created_at < created_to)
+
+    try:
+        rows, next_cursor = keyset_page(query, Report.created_at, Report.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    if user.role == "doctor":
+        return [
+            ReportListOut.model_validate({**row._mapping, "patient_name": row.patient_name or "Unknown"})
+            for row in rows
+        ]
+    return [ReportListOut.model_validate(dict(row._mapping)) for row in rows]
 
 @router.get("/{report_id}", response_model=ReportOut)
 def get_report(report_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    report = db.query(Report).filter(Report.id == report_id).first()
+    report = load_report_detail(db, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     if user.role == "patient" and report.patient_id != user.id:
         raise HTTPException(status_code=403, detail="Access denied")
     return ReportOut.model_validate(report)
 
-@router.post("/{report_id}/process", response_model=ReportOut)
-async def process_report(
+@router.post("/{report_id}/process", response_model=JobOut, status_code=202)
+def process_report(
     report_id: str,
     body: ProcessRequest = ProcessRequest(),
     user: User = Depends(get_current_user),
@@ -80,9 +150,44 @@ async def process_report(
     if user.role == "patient" and report.patient_id != user.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    from app.services.orchestrator import run_pipeline
-    report = await run_pipeline(report.id, body.personalization_level, db, lang=body.lang)
-    return ReportOut.model_validate(report)
+    # Doctors' regenerate requests jump ahead of routine patient uploads
+    from app.services.jobs import enqueue_job, queue_position
+    priority = body.priority if user.role == "doctor" else min(body.priority, 0)
+    job = enqueue_job(db, report.id, body.personalization_level, body.lang,
+                      priority=priority, requested_by=user.id, force=body.force)
+    out = JobOut.model_validate(job)
+    out.queue_position = queue_position(db, job)
+    return out
+
+@router.put("/{report_id}/personalization", response_model=ReportOut)
+def set_personalization(
+    report_id: str,
+    body: PersonalizationRequest,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Switch the explanation to another personalization level from the stored variants."""
+    from app.services.personalization import PERSONALIZATION_LEVELS
+    if body.personalization_level not in PERSONALIZATION_LEVELS:
+        raise HTTPException(status_code=400, detail=f"Unknown personalization level: {body.personalization_level}")
+    report = db.query(Report).filter(Report.id == report_id).first()
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if user.role == "patient" and report.patient_id != user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    variant = (report.explanation_variants or {}).get(body.personalization_level)
+    if variant is None:
+        # A doctor's edit clears the variants; rerunning the pipeline would discard that review
+        if report.verification_status or report.status in ("edited", "verified"):
+            raise HTTPException(status_code=409, detail="This explanation was reviewed by a doctor and is only available as reviewed")
+        # Reports explained before variants were stored need a pipeline run
+        raise HTTPException(status_code=409, detail="No stored explanation for this level; process the report again")
+    report.explanation_text = variant["explanation_text"]
+    report.explanation_sections = variant["sections"]
+    report.personalization_level = body.personalization_level
+    db.commit()
+    return ReportOut.model_validate(load_report_detail(db, report.id))
 
 @router.get("/{report_id}/trends")
 def get_report_trends(
@@ -5,6 +5,8 @@ from app.database import get_db
 from app.models import User, Report, ExplanationVersion, AuditLog
 from app.schemas import VerifyRequest, EditExplanationRequest, ReportOut, VersionOut
 from app.auth import get_current_user, require_role
+from app.services.trends import commit_report_series
+from app.routers.reports import load_report_detail
 
 router = APIRouter(prefix="/reports", tags=["Verification"])
 
@@ -32,8 +34,10 @@ def verify_report(
                      details={"notes": body.notes})
     db.add(audit)
     db.commit()
-    db.refresh(report)
-    return ReportOut.model_validate(report)
+    if not is_approved:
+        # Rejected reports no longer contribute to the patient's trends
+        commit_report_series(db, report, [])
+    return ReportOut.model_validate(load_report_detail(db, report.id))
 
 @router.post("/{report_id}/edit", response_model=ReportOut)
 def edit_explanation(
@@ -62,6 +66,8 @@ def edit_explanation(
     db.add(version)
     
     report.explanation_text = body.explanation_text
+    # The generated variants no longer match the edited text, so level switches must not restore them
+    report.explanation_variants = None
     report.doctor_notes = body.notes
     report.status = "edited"
     
@@ -69,8 +75,7 @@ def edit_explanation(
                      details={"notes": body.notes, "version": current_version})
     db.add(audit)
     db.commit()
-    db.refresh(report)
-    return ReportOut.model_validate(report)
+    return ReportOut.model_validate(load_report_detail(db, report.id))
 
 @router.get("/{report_id}/versions", response_model=list[VersionOut])
 def get_versions(
@@ -74,6 +74,7 @@ class ReportOut(BaseModel):
     lang: str
     review_requested: bool = False
     patient_note: Optional[str] = None
+    duplicate_of: Optional[str] = None
     findings: List[FindingOut] = []
     medications: List[MedicationOut] = []
     created_at: datetime
@@ -117,6 +118,28 @@ class VersionOut(BaseModel):
 class ProcessRequest(BaseModel):
     personalization_level: str = "standard"
     lang: str = "en"
+    priority: int = 0
+    force: bool = False  # rerun every stage, ignoring checkpoints
+
+class PersonalizationRequest(BaseModel):
+    personalization_level: str  # simple|standard|detailed
+
+class JobOut(BaseModel):
+    id: str
+    report_id: str
+    status: str
+    priority: int
+    personalization_level: str
+    lang: str
+    force: bool = False
+    attempts: int
+    error: Optional[str] = None
+    queue_position: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
 
 # ── Evaluation ──
 class EvaluationRunRequest(BaseModel):
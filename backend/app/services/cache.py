@@ -0,0 +1,156 @@
+"""Result Caches — persistent and in-process LRU stores for expensive pipeline outputs."""
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app.database import SessionLocal
+from app.models import CacheEntry
+
+def content_hash(*parts: Any) -> str:
+    """SHA-256 over bytes or canonical JSON of each part, in order."""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        h.update(part)
+        h.update(b"\x1f")  # separator so ("ab", "c") != ("a", "bc")
+    return h.hexdigest()
+
+class PersistentCache:
+    """
+    Cache rows live in the application database so they survive restarts and are shared by workers.
+    Each call uses its own short session, so cache reads and writes never join the caller's transaction.
+    """
+
+    def __init__(self, namespace: str, max_bytes: int, ttl_seconds: Optional[int] = None):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        db = SessionLocal()
+        try:
+            entry = db.query(CacheEntry).filter(CacheEntry.key == self._key(key)).first()
+            if entry is None:
+                return None
+            if self.ttl_seconds and entry.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+                db.delete(entry)
+                db.commit()
+                return None
+            entry.hit_count = (entry.hit_count or 0) + 1
+            entry.last_accessed_at = datetime.utcnow()
+            value = entry.value
+            db.commit()
+            return value
+        except Exception as e:
+            db.rollback()
+            print(f"Cache read failed ({self.namespace}): {e}")
+            return None
+        finally:
+            db.close()
+
+    def set(self, key: str, value: Any):
+        size = len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        db = SessionLocal()
+        try:
+            db.add(CacheEntry(key=self._key(key), namespace=self.namespace, value=value, size_bytes=size))
+            db.commit()
+            self._evict(db)
+        except IntegrityError:
+            # Another worker stored the same content first
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            print(f"Cache write failed ({self.namespace}): {e}")
+        finally:
+            db.close()
+
+    def _evict(self, db):
+        """Drop least-recently-used entries until the namespace fits its byte budget."""
+        total = db.query(func.coalesce(func.sum(CacheEntry.size_bytes), 0)).filter(
+            CacheEntry.namespace == self.namespace
+        ).scalar()
+        if total <= self.max_bytes:
+            return
+        stale = (
+            db.query(CacheEntry.key, CacheEntry.size_bytes)
+            .filter(CacheEntry.namespace == self.namespace)
+            .order_by(CacheEntry.last_accessed_at.asc())
+            .all()
+        )
+        doomed = []
+        for key, size in stale:
+            if total <= self.max_bytes:
+                break
+            doomed.append(key)
+            total -= size
+        if doomed:
+            db.query(CacheEntry).filter(CacheEntry.key.in_(doomed)).delete(synchronize_session=False)
+            db.commit()
+
+    def stats(self) -> dict:
+        db = SessionLocal()
+        try:
+            count, total, hits = db.query(
+                func.count(CacheEntry.key),
+                func.coalesce(func.sum(CacheEntry.size_bytes), 0),
+                func.coalesce(func.sum(CacheEntry.hit_count), 0)
+            ).filter(CacheEntry.namespace == self.namespace).one()
+            return {"entries": count, "bytes": total, "max_bytes": self.max_bytes, "hits": hits}
+        finally:
+            db.close()
+
+class TTLLRUCache:
+    """Thread-safe in-process LRU cache with a per-entry time-to-live and hit/miss counters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,72 @@
+"""Pipeline Events — in-process fan-out of stage progress and explanation text to SSE subscribers."""
+import json
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+# Events kept per report so a client that connects mid-run still sees the stages already done
+_HISTORY = 1000
+# Idle channels (no subscribers) retained for late subscribers before the oldest are dropped
+_MAX_IDLE_CHANNELS = 1024
+
+class _Channel:
+    def __init__(self):
+        self.run_id: Optional[str] = None
+        self.history: deque = deque(maxlen=_HISTORY)
+        self.subscribers: set = set()
+        self.next_id = 0
+
+_channels: "OrderedDict[str, _Channel]" = OrderedDict()
+
+def _channel(report_id: str) -> _Channel:
+    channel = _channels.get(report_id)
+    if channel is None:
+        channel = _channels[report_id] = _Channel()
+    _channels.move_to_end(report_id)
+    if len(_channels) > _MAX_IDLE_CHANNELS:
+        # Oldest first; channels with a connected client are kept regardless
+        for key in list(_channels):
+            if len(_channels) <= _MAX_IDLE_CHANNELS:
+                break
+            if key != report_id and not _channels[key].subscribers:
+                del _channels[key]
+    return channel
+
+def start_run(report_id: str, run_id: str):
+    """Begin a new run for the report (a job id); history from earlier runs is discarded."""
+    channel = _channel(report_id)
+    channel.run_id = run_id
+    channel.history.clear()
+
+def publish(report_id: str, event: str, data: Any):
+    """Deliver an event to every subscriber of the report. Must be called on the event loop."""
+    channel = _channel(report_id)
+    channel.next_id += 1
+    item = {"id": channel.next_id, "event": event, "data": data}
+    channel.history.append(item)
+    for queue in channel.subscribers:
+        queue.put_nowait(item)
+
+@asynccontextmanager
+async def subscribe(report_id: str, run_id: Optional[str] = None) -> AsyncIterator[asyncio.Queue]:
+    """
+    Queue of the report's events. When run_id matches the run in progress, the events it has
+    already published are replayed first.
+    """
+    channel = _channel(report_id)
+    queue: asyncio.Queue = asyncio.Queue()
+    if run_id is not None and channel.run_id == run_id:
+        for item in channel.history:
+            queue.put_nowait(item)
+    channel.subscribers.add(queue)
+    try:
+        yield queue
+    finally:
+        channel.subscribers.discard(queue)
+
+def format_sse(item: Dict) -> str:
+    """One Server-Sent Events frame."""
+    data = json.dumps(item["data"], ensure_ascii=False, default=str)
+    frame = f"id: {item['id']}\n" if item.get("id") else ""
+    return frame + f"event: {item['event']}\ndata: {data}\n\n"
@@ -1,18 +1,181 @@
 """Explanation Generation Service — grounded narrative via OpenRouter LLM."""
+import re
 import json
-import httpx
-from typing import List, Dict, Optional
+import time
+from typing import Any, Callable, List, Dict, Optional, Tuple
 from app.config import settings
+from app.services.cache import PersistentCache, content_hash
+from app.services.extraction import canonical_test_name
+from app.services.http_client import openrouter_chat, openrouter_chat_stream
+from app.services.metrics import metered_to_thread
+
+# Bump whenever the prompts or the response handling change so cached explanations stop matching
+EXPLANATION_PROMPT_VERSION = "2"
+
+_explanation_cache = PersistentCache(
+    "explanation", settings.EXPLANATION_CACHE_MAX_BYTES, ttl_seconds=settings.EXPLANATION_CACHE_TTL
+)
+_cache_stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+def _normalize_findings(findings: List[Dict]) -> List[tuple]:
+    return sorted(
+        (canonical_test_name(f.get("test_name") or ""), str(f.get("value") or "").strip(),
+         (f.get("unit") or "").strip().lower(), (f.get("reference_range") or "").strip(),
+         f.get("status") or "unknown")
+        for f in findings
+    )
+
+def _normalize_medications(medications: List[Dict]) -> List[tuple]:
+    return sorted(
+        tuple((m.get(k) or "").strip().lower() for k in ("name", "dosage", "frequency", "duration", "instructions"))
+        for m in medications
+    )
+
+class _ExplanationStream:
+    """
+    Pulls the summary text and each completed section object out of the JSON response while it
+    is still streaming, so clients can show them before the whole explanation has arrived.
+    """
+    _SUMMARY = re.compile(r'"summary"\s*:\s*"')
+    _SECTIONS = re.compile(r'"sections"\s*:\s*\[')
+
+    def __init__(self):
+        self.buffer = ""
+        self.summary_sent = 0
+        self.summary_done = False
+        self.sections_pos: Optional[int] = None
+        self.sections_done = False
+        self.section_start: Optional[int] = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, delta: str) -> List[Tuple[str, Any]]:
+        self.buffer += delta
+        return self._summary() + self._sections()
+
+    def _summary(self) -> List[Tuple[str, Any]]:
+        if self.summary_done:
+            return []
+        match = self._SUMMARY.search(self.buffer)
+        if not match:
+            return []
+        start = i = match.end()
+        escaped = False
+        while i < len(self.buffer):
+            c = self.buffer[i]
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                self.summary_done = True
+                break
+            i += 1
+        raw = self.buffer[start:i]
+        # A chunk can end inside an escape sequence ("\" or "\u00"); hold it back until complete
+        for trim in range(7):
+            try:
+                text = json.loads('"' + raw[:len(raw) - trim] + '"')
+                break
+            except json.JSONDecodeError:
+                continue
+        else:
+            return []
+        if len(text) <= self.summary_sent:
+            return []
+        delta, self.summary_sent = text[self.summary_sent:], len(text)
+        return [("summary", delta)]
+
+    def _sections(self) -> List[Tuple[str, Any]]:
+        if self.sections_done:
+            return []
+        if self.sections_pos is None:
+            match = self._SECTIONS.search(self.buffer)
+            if not match:
+                return []
+            self.sections_pos = match.end()
+        out = []
+        i = self.sections_pos
+        while i < len(self.buffer):
+            c = self.buffer[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c in "{[":
+                if self.depth == 0 and c == "{":
+                    self.section_start = i
+                self.depth += 1
+            elif c in "}]":
+                if self.depth == 0:  # end of the sections array
+                    self.sections_done = True
+                    break
+                self.depth -= 1
+                if self.depth == 0 and self.section_start is not None:
+                    try:
+                        out.append(("section", json.loads(self.buffer[self.section_start:i + 1])))
+                    except json.JSONDecodeError:
+                        pass
+                    self.section_start = None
+            i += 1
+        self.sections_pos = i
+        return out
+
+def explanation_cache_key(findings: List[Dict], evidence: List[Dict], medications: List[Dict],
+                          lang: str, ocr_text: Optional[str] = None) -> str:
+    """
+    Canonical hash of everything that shapes the explanation. Reports with the same findings,
+    evidence, medications and language share an entry, whatever their personalization level.
+    The raw document text is only part of the key when nothing structured was extracted, since
+    it is then the sole input.
+    """
+    evidence_ids = [content_hash(e.get("source"), e.get("content")) for e in evidence]
+    raw = content_hash(ocr_text or "") if not findings and not medications else None
+    return content_hash(
+        _normalize_findings(findings), evidence_ids, _normalize_medications(medications),
+        lang, settings.OPENROUTER_MODEL, EXPLANATION_PROMPT_VERSION, raw
+    )
 
 async def generate_explanation(
     findings: List[Dict],
     evidence: List[Dict],
     ocr_text: Optional[str] = None,
-    personalization_level: str = "standard",
     medications: List[Dict] = [],
-    lang: str = "en"
+    lang: str = "en",
+    use_cache: bool = True,
+    on_partial: Optional[Callable[[str, Any], None]] = None
 ) -> Dict:
-    """Generate a structured, grounded explanation from findings, medications, and evidence."""
+    """
+    Generate a structured, grounded explanation from findings, medications, and evidence.
+    The explanation is level-agnostic: each section carries the material for every
+    personalization level, which services/personalization.py derives without another call.
+    Identical inputs are served from the persistent explanation cache; result["cache"] records
+    hit, miss or bypass. Fallback explanations (LLM unavailable) are never cached.
+
+    With on_partial, the model response is streamed and on_partial(kind, payload) is called with
+    ("summary", text delta) and ("section", section dict) as they arrive, and ("reset", None) if a
+    failure mid-stream means the fallback explanation replaces what was sent.
+    """
+    use_cache = use_cache and settings.EXPLANATION_CACHE_ENABLED
+    cache_key = explanation_cache_key(findings, evidence, medications, lang, ocr_text)
+    if use_cache:
+        cached = await metered_to_thread(_explanation_cache.get, cache_key)
+        if cached:
+            _cache_stats["hits"] += 1
+            if on_partial:
+                on_partial("summary", cached.get("explanation_text", ""))
+                for section in cached.get("sections", []):
+                    on_partial("section", section)
+            return {**cached, "cache": "hit"}
+        _cache_stats["misses"] += 1
+    else:
+        _cache_stats["bypassed"] += 1
     
     findings_text = _format_findings(findings)
     medications_text = _format_medications(medications)
@@ -24,50 +187,70 @@ async def generate_explanation(
     }
     target_lang = lang_map.get(lang, "English")
     
-    system_prompt = _build_system_prompt(personalization_level, target_lang)
-    user_prompt = _build_user_prompt(findings_text, medications_text, evidence_text, ocr_text, personalization_level, target_lang)
+    system_prompt = _build_system_prompt(target_lang)
+    user_prompt = _build_user_prompt(findings_text, medications_text, evidence_text, ocr_text, target_lang)
     
+    payload = {
+        "model": settings.OPENROUTER_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 4000,  # room for the clinical detail and plain summary of each section
+        "response_format": {"type": "json_object"}
+    }
+    stream = on_partial is not None and settings.EXPLANATION_STREAMING
+    start = time.perf_counter()
+    first_token_ms = None
+    streamed = False
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://medclare.app",
-                    "X-Title": "MEDCLARE Medical Interpretation"
-                },
-                json={
-                    "model": settings.OPENROUTER_MODEL,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.3,
-                    "max_tokens": 3000,
-                    "response_format": {"type": "json_object"}
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
+        if stream:
+            parser = _ExplanationStream()
+            parts = []
+            async for delta in openrouter_chat_stream("explanation", payload, title="MEDCLARE Medical Interpretation"):
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+                parts.append(delta)
+                for kind, value in parser.feed(delta):
+                    streamed = True
+                    on_partial(kind, value)
+            content = "".join(parts)
+        else:
+            data = await openrouter_chat("explanation", payload, title="MEDCLARE Medical Interpretation")
             content = data["choices"][0]["message"]["content"]
-            
-            try:
-                result = json.loads(content)
-            except json.JSONDecodeError:
-                result = {"summary": content, "sections": [], "citations": []}
-            
-            return {
-                "explanation_text": result.get("summary", ""),
-                "sections": result.get("sections", []),
-                "citations": result.get("citations", []),
-                "confidence": 0.85,
-                "model_used": settings.OPENROUTER_MODEL
-            }
+        
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError:
+            result = {"summary": content, "sections": [], "citations": []}
+        
+        explanation = {
+            "explanation_text": result.get("summary", ""),
+            "sections": result.get("sections", []),
+            "citations": result.get("citations", []),
+            "confidence": 0.85,
+            "model_used": settings.OPENROUTER_MODEL
+        }
     
     except Exception as e:
         print(f"LLM call failed: {e}")
-        return _generate_fallback_explanation(findings, evidence)
+        if streamed:
+            on_partial("reset", None)
+        return {**_generate_fallback_explanation(findings, evidence), "cache": "miss" if use_cache else "bypass"}
+    
+    if use_cache:
+        await metered_to_thread(_explanation_cache.set, cache_key, explanation)
+    return {**explanation, "cache": "miss" if use_cache else "bypass", "first_token_ms": first_token_ms}
+
+def get_explanation_cache_stats() -> Dict:
+    """Hit rate of the explanation cache since startup, plus its stored size."""
+    lookups = _cache_stats["hits"] + _cache_stats["misses"]
+    return {
+        **_cache_stats,
+        "hit_rate": round(_cache_stats["hits"] / lookups, 3) if lookups else 0.0,
+        "store": _explanation_cache.stats(),
+    }
 
 def _format_findings(findings: List[Dict]) -> str:
     lines = []
@@ -90,7 +273,7 @@ def _format_evidence(evidence: List[Dict]) -> str:
         lines.append(f"[{i}] ({e.get('source', 'Reference')}) {e['content']}")
     return "\n\n".join(lines)
 
-def _build_system_prompt(level: str, target_lang: str) -> str:
+def _build_system_prompt(target_lang: str) -> str:
     return f"""You are MEDCLARE, a medical document interpretation system. You DO NOT diagnose. 
 You explain medical lab results AND other medical documents (like prescriptions or advisory notes) based on structured findings and raw document text.
 
@@ -104,6 +287,7 @@ CRITICAL RULES:
 7. Express uncertainty when text is unclear or evidence is limited.
 8. Always include "Recommended Actions" (e.g., "Follow the prescribed course", "Consult your doctor").
 9. For each section, provide a "source_mapping" array that traces each key claim back to its source.
+10. Rules 2, 3 and 7 apply to "clinical_detail" and "plain_summary" as much as to "content".
 
 OUTPUT FORMAT (JSON):
 {{
@@ -111,7 +295,9 @@ OUTPUT FORMAT (JSON):
   "sections": [
     {{
       "title": "Category Name in {target_lang} (e.g. Medications, Hematology, Instructions)",
-      "content": "Detailed explanation in {target_lang} with [N] citations where applicable",
+      "content": "Clear explanation in {target_lang} with [N] citations where applicable, briefly explaining medical terms",
+      "clinical_detail": "Additional clinical depth in {target_lang} (pathophysiology, mechanisms, related markers) with [N] citations, or empty",
+      "plain_summary": "The same section restated in one or two sentences of very simple {target_lang}, without jargon",
       "findings_covered": ["Test1", "MedicationA"],
       "severity": "normal|attention|concern",
       "source_mapping": [
@@ -126,13 +312,7 @@ OUTPUT FORMAT (JSON):
   "disclaimer": "Standard medical disclaimer text in {target_lang}"
 }}"""
 
-def _build_user_prompt(findings: str, medications: str, evidence: str, ocr_text: Optional[str], level: str, target_lang: str) -> str:
-    complexity_guide = {
-        "simple": f"Use very simple language in {target_lang} at a 6th-grade reading level. Avoid medical jargon. Be reassuring.",
-        "standard": f"Use clear, accessible language in {target_lang}. Briefly explain medical terms when used.",
-        "detailed": f"Provide thorough clinical detail in {target_lang}. Include pathophysiology context where relevant."
-    }
-    
+def _build_user_prompt(findings: str, medications: str, evidence: str, ocr_text: Optional[str], target_lang: str) -> str:
     prompt = f"""## Raw Document Text
 {ocr_text if ocr_text else "Not available"}
 
@@ -145,9 +325,12 @@ def _build_user_prompt(findings: str, medications: str, evidence: str, ocr_text:
 ## Retrieved Medical Evidence
 {evidence if evidence else "No direct medical evidence found"}
 
-## Personalization & Language
+## Reading Levels & Language
 Target Language: {target_lang}
-{complexity_guide.get(level, complexity_guide['standard'])}
+Write every section for all readers at once; the reading level is chosen later:
+- "content": clear, accessible language. Briefly explain medical terms when used.
+- "clinical_detail": thorough clinical detail, including pathophysiology context where relevant.
+- "plain_summary": very simple language at a 6th-grade reading level. Avoid medical jargon. Be reassuring.
 
 Generate a structured, grounded explanation for this medical document in {target_lang}. 
 If it is a prescription/advisory note, summarize the medications and instructions accurately.
@@ -1,8 +1,12 @@
 import re
 import json
-import httpx
-from typing import List, Dict, Optional
+from bisect import bisect_right
+from typing import List, Dict, Optional, Tuple
 from app.config import settings
+from app.services.http_client import openrouter_chat
+
+# Bump when extraction prompts or parsing change so pipeline checkpoints are recomputed
+EXTRACTION_VERSION = "2"
 
 # Common medical test patterns for extraction
 COMMON_TESTS = {
@@ -73,6 +77,52 @@ COMMON_TESTS = {
     "folic acid": {"unit": "ng/mL", "ref": "2.7-17.0", "category": "Vitamins"},
 }
 
+# Aliases in COMMON_TESTS that name the same parameter, mapped to one canonical name
+TEST_ALIASES = {
+    "hgb": "hemoglobin",
+    "hct": "hematocrit",
+    "red blood cell": "rbc",
+    "white blood cell": "wbc",
+    "plt": "platelet",
+    "blood sugar": "glucose",
+    "glycated hemoglobin": "hba1c",
+    "blood urea nitrogen": "bun",
+    "total cholesterol": "cholesterol",
+    "ast": "sgot",
+    "alt": "sgpt",
+    "alp": "alkaline phosphatase",
+    "total bilirubin": "bilirubin",
+    "folic acid": "folate",
+}
+
+# Spellings of the units in COMMON_TESTS, normalised by _canonical_unit. Only true synonyms
+# belong here; a value printed in any other unit (e.g. mmol/L glucose) is not comparable to
+# the stored reference range and must not be flagged against it.
+_UNIT_SYNONYMS = {
+    "10^3/ul": "k/ul", "x10^3/ul": "k/ul", "10^9/l": "k/ul", "x10^9/l": "k/ul",
+    "thou/ul": "k/ul", "10e3/ul": "k/ul", "/nl": "k/ul",
+    "10^6/ul": "m/ul", "x10^6/ul": "m/ul", "10^12/l": "m/ul", "x10^12/l": "m/ul",
+    "mill/ul": "m/ul", "10e6/ul": "m/ul", "/pl": "m/ul",
+    "mmol/l": "meq/l",  # identical for the monovalent electrolytes listed (Na, K, Cl)
+    "uiu/ml": "miu/l", "iu/l": "u/l", "mm/h": "mm/hr", "mm/1sthr": "mm/hr",
+    "mcg/dl": "ug/dl",
+}
+
+def _canonical_unit(unit: str) -> str:
+    cleaned = re.sub(r"\s+", "", (unit or "").lower()).replace("µ", "u").replace("μ", "u").replace("cumm", "ul")
+    return _UNIT_SYNONYMS.get(cleaned, cleaned)
+
+def unit_matches(test_key: str, unit: str) -> bool:
+    """True when a printed unit is a spelling of the unit COMMON_TESTS assumes for the test."""
+    expected = COMMON_TESTS[test_key]["unit"]
+    return bool(unit) and _canonical_unit(unit) == _canonical_unit(expected)
+
+def canonical_test_name(name: str) -> str:
+    """Normalise a test name ("Hemoglobin (Hb)", "HGB", "Total  Bilirubin") to one parameter key."""
+    cleaned = re.sub(r"\(.*?\)", " ", (name or "").lower()).replace(".", "")
+    cleaned = re.sub(r"[^a-z0-9]+", " ", cleaned).strip()
+    return TEST_ALIASES.get(cleaned, cleaned)
+
 def parse_reference_range(ref_str: str):
     """Parse reference range string into min/max values."""
     if not ref_str:
@@ -102,55 +152,89 @@ def determine_status(value: float, ref_range: str) -> str:
         return "critical" if value > high * 1.5 else "high"
     return "normal"
 
+def _trie_regex(words: List[str]) -> str:
+    """Build a prefix-factored alternation so the regex engine walks shared prefixes once."""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        # A greedy optional tail tries the longer key ("mchc") before its prefix ("mch")
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if terminal else body
+
+    return build(trie)
+
+_TEST_ORDER = {key: i for i, key in enumerate(COMMON_TESTS)}
+
+_UNIT = r'(?:x[^\S\n]*)?10[\^e]?\d+/[a-zµμ]+|[a-zµμ%/][a-z0-9µμ%/\^]*'
+_RANGE = r'[<>≤≥][^\S\n]*\d+\.?\d*|\d+\.?\d*[^\S\n]*[-–—][^\S\n]*\d+\.?\d*'
+
+# One pass over the whole text. The lookahead makes matches zero-width, so overlapping tests
+# ("glycated hemoglobin" and "hemoglobin") are both found; [^\S\n] keeps a match on one line.
+# Groups: test, value, printed unit (optional), printed reference range (optional).
+_FINDING_PATTERN = re.compile(
+    rf'(?=({_trie_regex(list(COMMON_TESTS))})[^\S\n]*[:\.\-\|]?[^\S\n]*(\d+\.?\d*)'
+    rf'(?:[^\S\n]*({_UNIT}))?(?:[^\S\n]*[\(\[]?[^\S\n]*({_RANGE}))?)',
+    re.IGNORECASE
+)
+
+_GENERIC_PATTERN = re.compile(
+    r'([A-Za-z][A-Za-z\s\.]{2,30}?)\s*[:\.\-\|]+\s*(\d+\.?\d*)\s*([A-Za-z/%]+)?\s*(?:[\(\[]?\s*(\d+\.?\d*\s*[-–]\s*\d+\.?\d*)\s*[\)\]]?)?'
+)
+
+def _scan_known_tests(ocr_text: str):
+    """
+    Return ({test_key: (line_no, order, value, unit, ref)} for each test's first match,
+    set of matched line numbers, set of line numbers whose printed unit is the expected one).
+    """
+    newlines = [i for i, ch in enumerate(ocr_text) if ch == "\n"]
+    first_seen: Dict[str, tuple] = {}
+    matched_lines = set()
+    trusted_lines = set()
+    for match in _FINDING_PATTERN.finditer(ocr_text):
+        test_key = match.group(1).lower()
+        unit, ref = match.group(3) or "", (match.group(4) or "").replace(" ", "")
+        line_no = bisect_right(newlines, match.start())
+        matched_lines.add(line_no)
+        if unit_matches(test_key, unit):
+            trusted_lines.add(line_no)
+        if test_key not in first_seen:
+            first_seen[test_key] = (line_no, _TEST_ORDER[test_key], match.group(2), unit, ref)
+    return first_seen, matched_lines, trusted_lines
+
 def extract_findings(ocr_text: str) -> List[Dict]:
     """Extract structured findings from OCR text using regex patterns."""
-    findings = []
-    lines = ocr_text.split('\n')
+    # First match of each known test wins; results are ordered by line, then by COMMON_TESTS order
+    first_seen, _, _ = _scan_known_tests(ocr_text)
     
-    for line in lines:
-        line_clean = line.strip()
-        if not line_clean:
-            continue
-        
-        # Pattern: Test Name ... Value (Unit) ... Reference Range
-        # Try multiple patterns
-        for test_key, test_info in COMMON_TESTS.items():
-            pattern = re.compile(
-                rf'({re.escape(test_key)})\s*[:\.\-\|]?\s*(\d+\.?\d*)\s*({re.escape(test_info["unit"])})?',
-                re.IGNORECASE
-            )
-            match = pattern.search(line_clean)
-            if match:
-                value_str = match.group(2)
-                try:
-                    value_num = float(value_str)
-                except ValueError:
-                    continue
-                
-                ref = test_info["ref"]
-                status = determine_status(value_num, ref)
-                
-                # Avoid duplicates
-                already = any(f["test_name"].lower() == test_key.lower() for f in findings)
-                if not already:
-                    findings.append({
-                        "test_name": test_key.upper() if len(test_key) <= 4 else test_key.title(),
-                        "value": value_str,
-                        "unit": test_info["unit"],
-                        "reference_range": ref,
-                        "status": status,
-                        "category": test_info["category"],
-                        "confidence": 0.85
-                    })
+    findings = []
+    for test_key, (_, _, value_str, unit, printed_ref) in sorted(first_seen.items(), key=lambda kv: kv[1][:2]):
+        test_info = COMMON_TESTS[test_key]
+        # The report's own range always wins; the built-in one only applies in its own unit
+        comparable = not unit or unit_matches(test_key, unit)
+        ref = printed_ref or (test_info["ref"] if comparable else "")
+        findings.append({
+            "test_name": test_key.upper() if len(test_key) <= 4 else test_key.title(),
+            "value": value_str,
+            "unit": unit or test_info["unit"],
+            "reference_range": ref or "N/A",
+            "status": determine_status(float(value_str), ref) if ref else "unknown",
+            "category": test_info["category"],
+            "confidence": 0.85 if comparable else 0.6
+        })
     
     # If no findings from regex, try a generic numeric extraction pattern
     if not findings:
-        generic_pattern = re.compile(
-            r'([A-Za-z][A-Za-z\s\.]{2,30}?)\s*[:\.\-\|]+\s*(\d+\.?\d*)\s*([A-Za-z/%]+)?\s*(?:[\(\[]?\s*(\d+\.?\d*\s*[-–]\s*\d+\.?\d*)\s*[\)\]]?)?'
-        )
-        for line in lines:
-            matches = generic_pattern.findall(line)
-            for m in matches:
+        for line in ocr_text.split('\n'):
+            for m in _GENERIC_PATTERN.findall(line):
                 test_name = m[0].strip()
                 value = m[1]
                 unit = m[2] if m[2] else ""
@@ -191,25 +275,105 @@ async def classify_document_type(ocr_text: str) -> str:
     {ocr_text[:2000]}
     """
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                headers={"Authorization": f"Bearer {settings.OPENROUTER_API_KEY}", "Content-Type": "application/json"},
-                json={
-                    "model": settings.OPENROUTER_MODEL,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.0
-                }
-            )
-            response.raise_for_status()
-            category = response.json()["choices"][0]["message"]["content"].strip().lower()
-            if "lab_report" in category: return "lab_report"
-            if "prescription" in category: return "prescription"
-            if "advice" in category: return "advice"
-            return "lab_report"
+        data = await openrouter_chat("classification", {
+            "model": settings.OPENROUTER_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.0
+        })
+        category = data["choices"][0]["message"]["content"].strip().lower()
+        if "lab_report" in category: return "lab_report"
+        if "prescription" in category: return "prescription"
+        if "advice" in category: return "advice"
+        return "lab_report"
     except Exception:
         return "lab_report"
 
+def extraction_coverage(ocr_text: str) -> Dict:
+    """
+    How much of the report the deterministic extractor understands.
+    A candidate row is a "name: value" line that also carries a unit or reference range, or
+    any line where a known test was matched. A row is covered only when a known test was
+    matched on it with its expected unit printed: a missing or different unit (SI reports,
+    g/L haemoglobin) means the built-in range cannot be trusted, so the row stays unknown.
+    """
+    _, matched_lines, trusted_lines = _scan_known_tests(ocr_text)
+    candidates = set(matched_lines)
+    for line_no, line in enumerate(ocr_text.split("\n")):
+        if any(m[2] or m[3] for m in _GENERIC_PATTERN.findall(line)):
+            candidates.add(line_no)
+    unknown_rows = sorted(candidates - trusted_lines)
+    coverage = (len(candidates) - len(unknown_rows)) / len(candidates) if candidates else 0.0
+    return {
+        "coverage": round(coverage, 3),
+        "known_rows": len(trusted_lines),
+        "unit_mismatch_rows": len(matched_lines - trusted_lines),
+        "candidate_rows": len(candidates),
+        "unknown_rows": len(unknown_rows),
+    }
+
+# Lab extractions served locally vs. sent to the LLM, since process start. Only extractions whose
+# result the pipeline kept are counted; speculative branches it discarded are counted apart.
+_extraction_stats = {"lab_extractions": 0, "llm_calls": 0, "speculative_discarded": 0}
+
+def _deterministic_coverage(ocr_text: str) -> Optional[Dict]:
+    """Coverage figures when the regex extractor alone may serve the report, else None."""
+    if settings.EXTRACTION_MODE != "deterministic_first":
+        return None
+    coverage = extraction_coverage(ocr_text)
+    if (coverage["known_rows"] and coverage["coverage"] >= settings.EXTRACTION_COVERAGE_THRESHOLD
+            and coverage["unknown_rows"] <= settings.EXTRACTION_MAX_UNKNOWN_ROWS):
+        return coverage
+    return None
+
+def lab_extraction_needs_llm(ocr_text: str) -> bool:
+    """Whether extract_lab_report would call the LLM for this text (cheap, local check)."""
+    return _deterministic_coverage(ocr_text) is None
+
+async def extract_lab_report(ocr_text: str) -> Tuple[List[Dict], Dict]:
+    """
+    Lab extraction honouring EXTRACTION_MODE.
+    In "deterministic_first" mode the regex extractor runs first and the LLM is only called when
+    coverage is below EXTRACTION_COVERAGE_THRESHOLD or unrecognised numeric rows remain.
+    Returns (findings, meta) where meta records the method used and the coverage figures.
+    Statistics are recorded by the caller through record_extraction once the result is kept.
+    """
+    meta: Dict = {"method": "llm"}
+    coverage = _deterministic_coverage(ocr_text)
+    if coverage is not None:
+        meta.update(coverage, method="deterministic")
+        return extract_findings(ocr_text), meta
+    if settings.EXTRACTION_MODE == "deterministic_first":
+        meta.update(extraction_coverage(ocr_text))
+    findings = await extract_lab_report_ai(ocr_text)
+    if not findings and settings.EXTRACTION_MODE == "deterministic_first":
+        # The LLM call failed or returned nothing; partial local results beat none
+        meta["method"] = "deterministic_fallback"
+        return extract_findings(ocr_text), meta
+    return findings, meta
+
+def record_extraction(branch: str, meta: Dict):
+    """Count an extraction the pipeline kept; only lab extractions can avoid the LLM."""
+    if branch == "lab_report":
+        _extraction_stats["lab_extractions"] += 1
+        if meta.get("method") != "deterministic":
+            _extraction_stats["llm_calls"] += 1
+
+def record_speculative_discard(count: int = 1):
+    """Count speculative extraction branches started and then thrown away."""
+    _extraction_stats["speculative_discarded"] += count
+
+def get_extraction_stats() -> Dict:
+    total = _extraction_stats["lab_extractions"]
+    avoided = total - _extraction_stats["llm_calls"]
+    return {
+        "mode": settings.EXTRACTION_MODE,
+        "lab_extractions": total,
+        "llm_calls": _extraction_stats["llm_calls"],
+        "llm_avoided": avoided,
+        "speculative_discarded": _extraction_stats["speculative_discarded"],
+        "llm_avoidance_rate": round(avoided / total, 3) if total else 0.0,
+    }
+
 async def extract_lab_report_ai(ocr_text: str) -> List[Dict]:
     """Specialized extractor for laboratory findings."""
     prompt = f"""
@@ -239,27 +403,25 @@ async def extract_prescription_ai(ocr_text: str) -> List[Dict]:
     """
     return await _call_gemini_json(prompt)
 
+async def extract_prescription(ocr_text: str) -> Tuple[List[Dict], Dict]:
+    """Prescription extraction with the same (items, meta) shape as extract_lab_report."""
+    return await extract_prescription_ai(ocr_text), {"method": "llm"}
+
 async def _call_gemini_json(prompt: str) -> List[Dict]:
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                headers={"Authorization": f"Bearer {settings.OPENROUTER_API_KEY}", "Content-Type": "application/json"},
-                json={
-                    "model": settings.OPENROUTER_MODEL,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.0,
-                    "response_format": { "type": "json_object" } if "gemini-2.0-flash" in settings.OPENROUTER_MODEL else None
-                }
-            )
-            response.raise_for_status()
-            content = response.json()["choices"][0]["message"]["content"]
-            if "```json" in content: content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content: content = content.split("```")[1].split("```")[0].strip()
-            data = json.loads(content)
-            if isinstance(data, dict):
-                for val in data.values():
-                    if isinstance(val, list): return val
-            return data if isinstance(data, list) else []
+        data = await openrouter_chat("extraction", {
+            "model": settings.OPENROUTER_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.0,
+            "response_format": { "type": "json_object" } if "gemini-2.0-flash" in settings.OPENROUTER_MODEL else None
+        })
+        content = data["choices"][0]["message"]["content"]
+        if "```json" in content: content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content: content = content.split("```")[1].split("```")[0].strip()
+        data = json.loads(content)
+        if isinstance(data, dict):
+            for val in data.values():
+                if isinstance(val, list): return val
+        return data if isinstance(data, list) else []
     except Exception:
         return []
@@ -38,7 +38,7 @@ def check_guardrails(explanation_result: Dict) -> Dict:
     # 1. Check for diagnostic language
     diagnostic_flags = _check_diagnostic_language(text)
     for section in sections:
-        diagnostic_flags.extend(_check_diagnostic_language(section.get("content", "")))
+        diagnostic_flags.extend(_check_diagnostic_language(_section_text(section)))
     if diagnostic_flags:
         flags.append({
             "type": "diagnostic_language",
@@ -86,6 +86,10 @@ def check_guardrails(explanation_result: Dict) -> Dict:
     
     return explanation_result
 
+def _section_text(section: Dict) -> str:
+    # Every personalization level is derived from these fields, so all of them are screened
+    return " ".join(section.get(k) or "" for k in ("content", "clinical_detail", "plain_summary"))
+
 def _check_diagnostic_language(text: str) -> List[str]:
     issues = []
     for pattern in DIAGNOSTIC_PATTERNS:
@@ -121,7 +125,7 @@ def _check_alarmist_language(text: str, sections: List[Dict]) -> List[str]:
     alarmist_words = ["dangerous", "alarming", "severe", "critical condition", "emergency",
                       "life-threatening", "fatal", "deadly", "extremely worried", "panic"]
     issues = []
-    all_text = text + " " + " ".join(s.get("content", "") for s in sections)
+    all_text = text + " " + " ".join(_section_text(s) for s in sections)
     for word in alarmist_words:
         if word.lower() in all_text.lower():
             issues.append(f"Alarmist term detected: '{word}'")
@@ -0,0 +1,211 @@
+"""Shared HTTP Client — one pooled, keep-alive connection pool for all OpenRouter calls."""
+import json
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Optional
+import httpx
+from app.config import settings
+from app.services.metrics import record_llm_call
+
+# App-scoped client, created and closed by the FastAPI lifespan
+_client: Optional[httpx.AsyncClient] = None
+_http2_active = False
+
+# Per-stage latency samples (seconds), bounded so memory stays flat under load
+_LATENCY_WINDOW = 1000
+_stats: Dict = {
+    "requests": 0,
+    "errors": 0,
+    "connections_opened": 0,
+    "connections_reused": 0,
+    "latency": {},
+}
+
+# Per-stage read/write/pool timeouts, looked up on settings so .env overrides apply;
+# connecting is bounded separately by HTTP_CONNECT_TIMEOUT
+STAGE_TIMEOUTS = {
+    "ocr": "OCR_TIMEOUT",
+    "classification": "CLASSIFICATION_TIMEOUT",
+    "extraction": "EXTRACTION_TIMEOUT",
+    "explanation": "EXPLANATION_TIMEOUT",
+}
+
+def _build_client() -> httpx.AsyncClient:
+    global _http2_active
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    http2 = settings.HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401 — httpx needs the optional h2 package for HTTP/2
+        except ImportError:
+            print("h2 package not installed. Falling back to HTTP/1.1 keep-alive.")
+            http2 = False
+    _http2_active = http2
+    return httpx.AsyncClient(
+        base_url=settings.OPENROUTER_BASE_URL,
+        http2=http2,
+        limits=limits,
+        timeout=httpx.Timeout(60.0, connect=settings.HTTP_CONNECT_TIMEOUT),
+    )
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the shared client. Called once from the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+async def close_http_client():
+    """Close the shared client and release pooled connections."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily for scripts running outside the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+def _stage_timeout(stage: str) -> httpx.Timeout:
+    # A bare float would replace the connect timeout too; only read/write/pool follow the stage
+    seconds = getattr(settings, STAGE_TIMEOUTS.get(stage, ""), 60.0)
+    return httpx.Timeout(seconds, connect=settings.HTTP_CONNECT_TIMEOUT)
+
+def _connection_tracer(opened: list):
+    async def trace(event_name: str, info: Dict):
+        # httpcore only emits connect_tcp when the pool has no reusable connection
+        if event_name == "connection.connect_tcp.complete":
+            opened.append(event_name)
+    return trace
+
+def _count_connection(opened: list):
+    if opened:
+        _stats["connections_opened"] += 1
+    else:
+        _stats["connections_reused"] += 1
+
+def _openrouter_headers(title: Optional[str] = None) -> Dict[str, str]:
+    headers = {
+        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+    }
+    if title:
+        headers["HTTP-Referer"] = "https://medclare.app"
+        headers["X-Title"] = title
+    return headers
+
+async def openrouter_chat(stage: str, payload: Dict, title: Optional[str] = None) -> Dict:
+    """
+    POST a chat completion through the shared pool and return the decoded JSON body.
+    Raises httpx errors to the caller so each service keeps its own fallback behaviour.
+    """
+    client = get_http_client()
+    opened = []
+    start = time.perf_counter()
+    _stats["requests"] += 1
+    request = client.build_request(
+        "POST", "/chat/completions",
+        headers=_openrouter_headers(title),
+        json=payload,
+        timeout=_stage_timeout(stage),
+        extensions={"trace": _connection_tracer(opened)},
+    )
+    try:
+        response = await client.send(request)
+        _count_connection(opened)
+        response.raise_for_status()
+        data = response.json()
+        record_llm_call(stage, len(request.content), len(response.content), data.get("usage"))
+        return data
+    except Exception:
+        _stats["errors"] += 1
+        record_llm_call(stage, len(request.content), 0, None, ok=False)
+        raise
+    finally:
+        samples = _stats["latency"].setdefault(stage, deque(maxlen=_LATENCY_WINDOW))
+        samples.append(time.perf_counter() - start)
+
+async def openrouter_chat_stream(stage: str, payload: Dict, title: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Streaming variant of openrouter_chat (`stream: true`): yields content deltas as the
+    provider sends them. Raises httpx errors to the caller, possibly after some deltas.
+    """
+    client = get_http_client()
+    opened = []
+    request = client.build_request(
+        "POST", "/chat/completions",
+        headers=_openrouter_headers(title),
+        json={**payload, "stream": True},
+        timeout=_stage_timeout(stage),
+        extensions={"trace": _connection_tracer(opened)},
+    )
+    start = time.perf_counter()
+    _stats["requests"] += 1
+    received = 0
+    usage = None
+    try:
+        response = await client.send(request, stream=True)
+        _count_connection(opened)
+        try:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                received += len(line) + 1
+                # SSE frames: "data: {...}"; lines starting with ":" are keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                chunk = line[5:].strip()
+                if chunk == "[DONE]":
+                    break
+                body = json.loads(chunk)
+                usage = body.get("usage") or usage
+                for choice in body.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+        finally:
+            await response.aclose()
+        record_llm_call(stage, len(request.content), received, usage)
+    except Exception:
+        _stats["errors"] += 1
+        record_llm_call(stage, len(request.content), 0, None, ok=False)
+        raise
+    finally:
+        samples = _stats["latency"].setdefault(stage, deque(maxlen=_LATENCY_WINDOW))
+        samples.append(time.perf_counter() - start)
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+def get_http_stats() -> Dict:
+    """Connection-reuse and per-stage latency statistics for the shared pool."""
+    requests = _stats["requests"]
+    opened = _stats["connections_opened"]
+    reused = _stats["connections_reused"]
+    return {
+        "http2": _http2_active,
+        "requests": requests,
+        "errors": _stats["errors"],
+        "connections_opened": opened,
+        "connections_reused": reused,
+        "reuse_ratio": round(reused / (opened + reused), 3) if opened + reused else 0.0,
+        "latency_ms": {
+            stage: {
+                "count": len(samples),
+                "p50": round(_percentile(samples, 50) * 1000, 1),
+                "p95": round(_percentile(samples, 95) * 1000, 1),
+                "p99": round(_percentile(samples, 99) * 1000, 1),
+            }
+            for stage, samples in _stats["latency"].items()
+        },
+    }
@@ -0,0 +1,219 @@
+"""Pipeline Job Queue — persistent, priority-ordered background execution of the pipeline."""
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine
+from app.models import PipelineJob
+from app.services.events import publish, start_run
+from app.services.metrics import record_retry
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_next_recovery = 0.0
+
+def _wake_workers():
+    """
+    Wake idle workers. Safe from any thread: sync endpoints call enqueue_job from FastAPI's
+    threadpool, and asyncio.Event may only be touched from its own loop.
+    """
+    if _wakeup is not None and _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+def enqueue_job(
+    db: Session,
+    report_id: str,
+    personalization_level: str = "standard",
+    lang: str = "en",
+    priority: int = 0,
+    requested_by: Optional[str] = None,
+    force: bool = False
+) -> PipelineJob:
+    """
+    Persist a pipeline job and wake a worker.
+    An identical job already waiting for the same report is returned instead of queueing a duplicate.
+    """
+    existing = (
+        db.query(PipelineJob)
+        .filter(PipelineJob.report_id == report_id)
+        .filter(PipelineJob.status.in_(ACTIVE_STATUSES))
+        .filter(PipelineJob.personalization_level == personalization_level)
+        .filter(PipelineJob.lang == lang)
+        .filter(PipelineJob.force == force)
+        .first()
+    )
+    if existing:
+        return existing
+
+    job = PipelineJob(
+        report_id=report_id,
+        requested_by=requested_by,
+        personalization_level=personalization_level,
+        lang=lang,
+        priority=priority,
+        force=force,
+        status="queued"
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _wake_workers()
+    return job
+
+def queue_position(db: Session, job: PipelineJob) -> Optional[int]:
+    """Number of queued jobs that will run before this one (0 = next)."""
+    if job.status != "queued":
+        return None
+    ahead = (
+        db.query(PipelineJob)
+        .filter(PipelineJob.status == "queued")
+        .filter(
+            (PipelineJob.priority > job.priority) |
+            ((PipelineJob.priority == job.priority) & (PipelineJob.created_at < job.created_at))
+        )
+        .count()
+    )
+    return ahead
+
+def _report_busy():
+    """True when another job for the same report is already running."""
+    running = aliased(PipelineJob)
+    return exists().where(running.report_id == PipelineJob.report_id, running.status == "running")
+
+async def _claim_next_job(db: AsyncSession) -> Optional[PipelineJob]:
+    """
+    Atomically move the highest-priority queued job to running. Jobs for a report that already
+    has a running job wait, so two pipelines never write the same report at once.
+    """
+    while True:
+        candidate = (await db.execute(
+            select(PipelineJob)
+            .where(PipelineJob.status == "queued", ~_report_busy())
+            .order_by(PipelineJob.priority.desc(), PipelineJob.created_at.asc())
+            .limit(1)
+        )).scalar_one_or_none()
+        if candidate is None:
+            return None
+        # Conditional update so two workers never claim the same row
+        now = datetime.utcnow()
+        claimed = (await db.execute(
+            update(PipelineJob)
+            .where(PipelineJob.id == candidate.id, PipelineJob.status == "queued", ~_report_busy())
+            .values(status="running", started_at=now, heartbeat_at=now, attempts=PipelineJob.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )).rowcount
+        await db.commit()
+        if claimed:
+            await db.refresh(candidate)
+            return candidate
+
+async def _heartbeat(job_id: str):
+    """Keep a running job's lease alive so no other process recovers it mid-pipeline."""
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+        try:
+            async with async_engine.begin() as conn:
+                await conn.execute(
+                    update(PipelineJob).where(PipelineJob.id == job_id, PipelineJob.status == "running")
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+        except Exception as e:
+            print(f"Heartbeat for job {job_id} failed: {e}")
+
+async def _run_job(job_id: str):
+    from app.services.orchestrator import run_pipeline
+
+    async with AsyncSessionLocal() as db:
+        job = await db.get(PipelineJob, job_id)
+        if job is None:
+            return
+        report_id = job.report_id
+        start_run(report_id, job_id)
+        publish(report_id, "job", {"job_id": job_id, "status": "running", "attempts": job.attempts})
+        heartbeat = asyncio.create_task(_heartbeat(job_id))
+        try:
+            await run_pipeline(job.report_id, job.personalization_level, db, lang=job.lang, force=bool(job.force))
+            job = await db.get(PipelineJob, job_id, populate_existing=True)
+            job.status = "completed"
+            job.error = None
+        except Exception as e:
+            await db.rollback()
+            job = await db.get(PipelineJob, job_id, populate_existing=True)
+            job.error = str(e)
+            job.status = "queued" if job.attempts < settings.JOB_MAX_ATTEMPTS else "failed"
+            if job.status == "queued":
+                record_retry("pipeline_job")
+            print(f"Pipeline job {job_id} failed (attempt {job.attempts}): {e}")
+        finally:
+            heartbeat.cancel()
+        job.finished_at = datetime.utcnow() if job.status != "queued" else None
+        await db.commit()
+        publish(report_id, "job", {"job_id": job_id, "status": job.status, "error": job.error})
+    # A job for the same report may have been held back while this one ran
+    _wake_workers()
+
+async def _worker_loop(worker_id: int):
+    while True:
+        # Clear before claiming so an enqueue that races the claim still wakes us
+        _wakeup.clear()
+        try:
+            await _recover_interrupted_jobs()
+            async with AsyncSessionLocal() as db:
+                job = await _claim_next_job(db)
+        except Exception as e:
+            print(f"Job worker {worker_id} could not claim a job: {e}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _run_job(job.id)
+
+async def _recover_interrupted_jobs():
+    """
+    Requeue running jobs whose worker stopped mid-pipeline, recognised by a heartbeat older
+    than the lease. Jobs another live process is running keep their heartbeat fresh and are
+    left alone. Checked at most once per heartbeat interval per process.
+    """
+    global _next_recovery
+    if time.monotonic() < _next_recovery:
+        return
+    _next_recovery = time.monotonic() + settings.JOB_HEARTBEAT_INTERVAL
+    expired = datetime.utcnow() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    async with AsyncSessionLocal() as db:
+        recovered = (await db.execute(
+            update(PipelineJob)
+            .where(PipelineJob.status == "running")
+            .where(func.coalesce(PipelineJob.heartbeat_at, PipelineJob.started_at) < expired)
+            .values(status="queued", started_at=None, heartbeat_at=None)
+            .execution_options(synchronize_session=False)
+        )).rowcount
+        await db.commit()
+    record_retry("job_recovery", recovered)
+
+async def start_workers():
+    """Start the bounded worker pool. Called once from the app lifespan."""
+    global _wakeup, _loop
+    _wakeup = asyncio.Event()
+    _loop = asyncio.get_running_loop()
+    for i in range(max(1, settings.JOB_WORKERS)):
+        _workers.append(asyncio.create_task(_worker_loop(i)))
+    _wakeup.set()
+
+async def stop_workers():
+    """Cancel workers; any job they were running is requeued once its lease expires."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,237 @@
+"""Metrics — per-stage timing and LLM usage, exposed in the Prometheus text format."""
+import os
+import time
+import types
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+# Seconds; spans cache hits (~ms) through slow vision OCR calls
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_lock = threading.Lock()
+
+def _label_str(labelnames: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{k}="{v}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values, safe to observe from worker threads."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, Dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {series['count']}")
+                lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {series['count']}")
+        return "\n".join(lines)
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with _lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labelnames, key)} {value}")
+        return "\n".join(lines)
+
+STAGE_WALL = Histogram("medclare_stage_wall_seconds", "Wall-clock time per pipeline stage.", ("stage",), TIME_BUCKETS)
+STAGE_CPU = Histogram("medclare_stage_cpu_seconds", "CPU time per pipeline stage, on the event loop, threads and OCR worker processes.", ("stage",), TIME_BUCKETS)
+STAGE_RUNS = Counter("medclare_stage_runs_total", "Pipeline stage executions by outcome.", ("stage", "outcome"))
+RETRIES = Counter("medclare_retries_total", "Operations retried after a failure or conflict.", ("operation",))
+LLM_PROMPT_TOKENS = Histogram("medclare_llm_prompt_tokens", "Prompt tokens per LLM call.", ("stage",), TOKEN_BUCKETS)
+LLM_COMPLETION_TOKENS = Histogram("medclare_llm_completion_tokens", "Completion tokens per LLM call.", ("stage",), TOKEN_BUCKETS)
+LLM_REQUEST_BYTES = Histogram("medclare_llm_request_bytes", "Request body size per LLM call.", ("stage",), BYTE_BUCKETS)
+LLM_RESPONSE_BYTES = Histogram("medclare_llm_response_bytes", "Response body size per LLM call.", ("stage",), BYTE_BUCKETS)
+LLM_CALLS = Counter("medclare_llm_requests_total", "LLM calls by outcome.", ("stage", "outcome"))
+
+_REGISTRY = (STAGE_WALL, STAGE_CPU, STAGE_RUNS, RETRIES, LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS,
+             LLM_REQUEST_BYTES, LLM_RESPONSE_BYTES, LLM_CALLS)
+
+# The sample of the stage currently running in this task; LLM calls made inside it add their usage
+_current_sample: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("stage_sample", default=None)
+
+def stage_label(name: str) -> str:
+    """'extraction:lab_report' → 'extraction', keeping label cardinality to the fixed stage set."""
+    return name.split(":", 1)[0]
+
+def _charge_cpu(sample: Optional[Dict], seconds: float):
+    # A sample whose stage already finished has been observed and no longer takes charges
+    if sample is not None and "_cpu" in sample:
+        sample["_cpu"] += seconds
+
+@types.coroutine
+def _step_metered(coro, sample: Dict):
+    """
+    Drive coro one step at a time and charge the thread CPU of each step to sample. Stages
+    overlap on the event loop, so only the steps that belong to this stage are counted.
+    """
+    value, error = None, None
+    while True:
+        start = time.thread_time()
+        try:
+            yielded = coro.send(value) if error is None else coro.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            sample["_cpu"] += time.thread_time() - start
+        value, error = None, None
+        try:
+            value = yield yielded
+        except GeneratorExit:
+            coro.close()
+            raise
+        except BaseException as e:
+            error = e
+
+def call_metered(fn: Callable[..., Any], *args) -> Any:
+    """Call fn on the event loop, charging its CPU time to the current stage."""
+    start = time.thread_time()
+    try:
+        return fn(*args)
+    finally:
+        _charge_cpu(_current_sample.get(), time.thread_time() - start)
+
+async def metered(awaitable: Awaitable) -> Any:
+    """Await a coroutine, charging the CPU of its own event-loop steps to the current stage."""
+    sample = _current_sample.get()
+    if sample is None or not asyncio.iscoroutine(awaitable):
+        return await awaitable
+    return await _step_metered(awaitable, sample)
+
+def _thread_call(fn: Callable[..., Any], *args) -> Tuple[Any, float]:
+    start = time.thread_time()
+    result = fn(*args)
+    return result, time.thread_time() - start
+
+async def metered_to_thread(fn: Callable[..., Any], *args) -> Any:
+    """asyncio.to_thread, charging the worker thread's CPU time to the current stage."""
+    sample = _current_sample.get()
+    result, cpu = await asyncio.to_thread(_thread_call, fn, *args)
+    _charge_cpu(sample, cpu)
+    return result
+
+def _process_cpu() -> float:
+    # Children cover subprocesses the worker waited for, such as the tesseract binary
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def _process_call(fn: Callable[..., Any], *args) -> Tuple[Any, float]:
+    start = _process_cpu()
+    result = fn(*args)
+    return result, _process_cpu() - start
+
+async def metered_in_process(pool, fn: Callable[..., Any], *args) -> Any:
+    """Run a picklable fn in a process pool, charging the worker's CPU time to the current stage."""
+    sample = _current_sample.get()
+    result, cpu = await asyncio.get_running_loop().run_in_executor(pool, _process_call, fn, *args)
+    _charge_cpu(sample, cpu)
+    return result
+
+def record_retry(operation: str, count: int = 1):
+    """Count a retry; one made inside a pipeline stage also shows in that stage's sample."""
+    if count <= 0:
+        return
+    RETRIES.inc(count, operation=operation)
+    sample = _current_sample.get()
+    if sample is not None:
+        sample["retries"] += count
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[Dict]:
+    """
+    Time a pipeline stage and collect the LLM usage and retries of calls made inside it. Yields
+    the sample dict, which is also what ends up in the reasoning trace. CPU time is what the
+    stage's work was charged through call_metered, metered and the metered_* executors.
+    Cancelled stages (a losing speculative branch) are counted but not timed.
+    """
+    sample = {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "request_bytes": 0,
+              "response_bytes": 0, "retries": 0, "_cpu": 0.0}
+    token = _current_sample.set(sample)
+    wall_start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield sample
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        _current_sample.reset(token)
+        wall = time.perf_counter() - wall_start
+        cpu = sample.pop("_cpu")
+        sample["wall_ms"] = round(wall * 1000, 1)
+        sample["cpu_ms"] = round(cpu * 1000, 1)
+        label = stage_label(stage)
+        STAGE_RUNS.inc(stage=label, outcome=outcome)
+        if outcome != "cancelled":
+            STAGE_WALL.observe(wall, stage=label)
+            STAGE_CPU.observe(cpu, stage=label)
+
+def record_llm_call(stage: str, request_bytes: int, response_bytes: int, usage: Optional[Dict], ok: bool = True):
+    """Called by openrouter_chat for every completion request."""
+    LLM_CALLS.inc(stage=stage, outcome="ok" if ok else "error")
+    LLM_REQUEST_BYTES.observe(request_bytes, stage=stage)
+    sample = _current_sample.get()
+    if sample is not None:
+        sample["llm_calls"] += 1
+        sample["request_bytes"] += request_bytes
+    if not ok:
+        return
+    usage = usage or {}
+    prompt = int(usage.get("prompt_tokens") or 0)
+    completion = int(usage.get("completion_tokens") or 0)
+    LLM_RESPONSE_BYTES.observe(response_bytes, stage=stage)
+    if usage:
+        LLM_PROMPT_TOKENS.observe(prompt, stage=stage)
+        LLM_COMPLETION_TOKENS.observe(completion, stage=stage)
+    if sample is not None:
+        sample["prompt_tokens"] += prompt
+        sample["completion_tokens"] += completion
+        sample["response_bytes"] += response_bytes
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
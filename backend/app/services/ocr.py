@@ -1,74 +1,228 @@
-"""OCR Service — extracts text from uploaded medical reports using cloud-based Gemini Vision."""
+"""OCR Service — extracts text from uploaded medical reports using cloud-based Gemini Vision or a local engine."""
 import os
 import base64
-import httpx
-from typing import Tuple
+import asyncio
+import hashlib
+import tempfile
+from typing import Dict, List, Optional, Tuple
 from app.config import settings
+from app.services.cache import PersistentCache, content_hash
+from app.services.http_client import openrouter_chat
+from app.services.metrics import metered, metered_to_thread, record_retry
+from app.services.preprocessing import preprocess_image, preprocess_signature
+from app.services.ocr_engines import OCREngine, register_ocr_engine, get_ocr_engine
+
+OCR_MODEL = "google/gemini-2.0-flash-001"
+OCR_PROMPT = "Transcribe all text from this medical report exactly as it appears. Maintain the tables, test names, values, units, and reference ranges. Do not add any interpretations or summaries. Output only the transcribed text."
+# Bump whenever OCR_PROMPT or the request shape changes so stale cache entries stop matching
+OCR_PROMPT_VERSION = "1"
+
+_ocr_cache = PersistentCache("ocr", settings.OCR_CACHE_MAX_BYTES)
+
+class CloudVisionEngine(OCREngine):
+    """Gemini Vision via OpenRouter over the shared connection pool."""
+    name = "cloud"
+
+    def signature(self) -> Tuple:
+        return (OCR_MODEL, OCR_PROMPT_VERSION)
+
+    async def transcribe(self, content: bytes, ext: str, mime_type: Optional[str] = None) -> Tuple[str, float]:
+        # Use a default high confidence for Gemini Vision
+        return await _cloud_ocr(content, ext, mime_type), 0.95
+
+register_ocr_engine(CloudVisionEngine())
+
+def ocr_signature(engine: Optional[OCREngine] = None) -> Tuple:
+    """Engine configuration and image preprocessing settings that determine a transcription."""
+    engine = engine or get_ocr_engine(settings.OCR_ENGINE)
+    return (*engine.signature(), *preprocess_signature())
+
+def ocr_cache_key(file_hash: str, engine: Optional[OCREngine] = None) -> str:
+    """Content address for a transcription: SHA-256 of the file bytes + OCR signature."""
+    return content_hash(file_hash, *ocr_signature(engine))
+
+def page_cache_key(file_hash: str, page_index: int, engine: Optional[OCREngine] = None) -> str:
+    """Content address for one rendered PDF page; the render DPI changes the image, so it is part of the key."""
+    return content_hash(file_hash, "page", page_index, settings.OCR_PDF_DPI, *ocr_signature(engine))
 
 async def perform_ocr(file_path: str) -> Tuple[str, float]:
     """
-    Perform OCR on the given file using Gemini 2.0 Flash via OpenRouter.
+    Perform OCR on the given file with the configured engine (Gemini 2.0 Flash via OpenRouter by default).
     Supports PNG, JPG, JPEG, TIFF, and PDF.
     """
+    ocr_text, confidence, _ = await perform_ocr_with_meta(file_path)
+    return ocr_text, confidence
+
+async def perform_ocr_with_meta(file_path: str, use_cache: bool = True, file_hash: Optional[str] = None) -> Tuple[str, float, Dict]:
+    """
+    OCR with a content-addressed cache in front of the engine call.
+    Pass the SHA-256 recorded at upload as file_hash to skip re-hashing the file.
+    If OCR_ENGINE fails, OCR_FALLBACK_ENGINE is tried; meta["fallback"] marks such results.
+    Returns (text, confidence, meta) where meta records the cache outcome and text source.
+    Raises when every engine failed, unless the fallback is "simulated" (demo mode only).
+    """
     ext = os.path.splitext(file_path)[1].lower()
+    use_cache = use_cache and settings.OCR_CACHE_ENABLED
     
-    try:
-        # Convert file to base64
+    file_content = None
+    if not file_hash:
         with open(file_path, "rb") as f:
             file_content = f.read()
+        file_hash = hashlib.sha256(file_content).hexdigest()
+    
+    engine_names = [settings.OCR_ENGINE]
+    if settings.OCR_FALLBACK_ENGINE not in ("", "simulated", settings.OCR_ENGINE):
+        engine_names.append(settings.OCR_FALLBACK_ENGINE)
+    
+    errors = []
+    for attempt, name in enumerate(engine_names):
+        if attempt:
+            record_retry("ocr_fallback")
+        try:
+            engine = get_ocr_engine(name)
+            ocr_text, confidence, meta = await _transcribe_file(file_path, ext, file_hash, file_content, use_cache, engine)
+            if attempt:
+                meta["fallback"] = True
+                meta["errors"] = errors
+            return ocr_text, confidence, meta
+        except Exception as e:
+            print(f"OCR with {name} engine failed: {e}")
+            errors.append(f"{name}: {e}")
+    
+    if settings.OCR_FALLBACK_ENGINE == "simulated":
+        # Sample text for offline demos only; never cached or checkpointed
+        ocr_text, confidence = _simulated_ocr(file_path)
+        return ocr_text, confidence, {"cache": "miss", "source": "simulated", "errors": errors}
+    raise RuntimeError(f"OCR failed: {'; '.join(errors)}")
+
+async def _transcribe_file(
+    file_path: str, ext: str, file_hash: str, file_content: Optional[bytes], use_cache: bool, engine: OCREngine
+) -> Tuple[str, float, Dict]:
+    cache_key = ocr_cache_key(file_hash, engine)
+    if use_cache:
+        cached = await metered_to_thread(_ocr_cache.get, cache_key)
+        if cached:
+            return cached["text"], cached["confidence"], {"cache": "hit", "source": "cache", "cache_key": cache_key}
+    
+    meta = {"cache": "miss" if use_cache else "bypass", "source": engine.name, "cache_key": cache_key}
+    pages = None
+    if ext == ".pdf" and settings.OCR_PDF_PAGE_SPLIT:
+        pages = await _ocr_pdf_pages(file_path, file_hash, use_cache, engine)
+    if pages:
+        ocr_text = "\n\n".join(p["text"] for p in pages if p["text"])
+        # Failed pages count as zero so a partial transcription never looks fully confident
+        confidence = round(sum(p["confidence"] for p in pages) / len(pages), 3)
+        meta["pages"] = [{k: v for k, v in p.items() if k != "text"} for p in pages]
+        meta["failed_pages"] = [p["page"] for p in pages if "error" in p]
+        meta["bytes_sent"] = sum(p.get("bytes_sent", 0) for p in pages)
+    else:
+        if file_content is None:
+            file_content = await metered_to_thread(_read_bytes, file_path)
+        payload, mime_type, prep = await _prepare_image(file_content, ext)
+        meta["bytes_sent"] = prep["sent_bytes"]
+        meta["preprocess"] = prep
+        ocr_text, confidence = await engine.transcribe(payload, ext, mime_type)
+    if use_cache and ocr_text and not meta.get("failed_pages"):
+        await metered_to_thread(_ocr_cache.set, cache_key, {"text": ocr_text, "confidence": confidence})
+    return ocr_text, confidence, meta
+
+def _render_pdf_pages(file_path: str, output_dir: str) -> Optional[List[str]]:
+    """Render each PDF page to a JPEG in output_dir; None when pdf2image/poppler is unavailable."""
+    try:
+        from pdf2image import convert_from_path
+    except ImportError:
+        print("pdf2image not installed. Sending PDFs to OCR as a single document.")
+        return None
+    try:
+        return convert_from_path(
+            file_path, dpi=settings.OCR_PDF_DPI, fmt="jpeg",
+            output_folder=output_dir, paths_only=True, thread_count=2
+        )
+    except Exception as e:
+        print(f"PDF page split failed ({e}). Sending PDF to OCR as a single document.")
+        return None
+
+async def _ocr_pdf_pages(file_path: str, file_hash: str, use_cache: bool, engine: OCREngine) -> Optional[List[Dict]]:
+    """
+    OCR every page of a PDF concurrently (at most OCR_PAGE_CONCURRENCY in flight), each behind
+    its own cache entry. Returns per-page results in page order, or None if the PDF could not be
+    split. Raises only when every page failed.
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        page_paths = await metered_to_thread(_render_pdf_pages, file_path, output_dir)
+        if not page_paths:
+            return None
+        semaphore = asyncio.Semaphore(settings.OCR_PAGE_CONCURRENCY)
         
-        base64_content = base64.b64encode(file_content).decode('utf-8')
+        async def ocr_page(index: int, page_path: str) -> Dict:
+            key = page_cache_key(file_hash, index, engine)
+            if use_cache:
+                cached = await metered_to_thread(_ocr_cache.get, key)
+                if cached:
+                    return {"page": index + 1, "text": cached["text"], "confidence": cached["confidence"], "cache": "hit"}
+            async with semaphore:
+                try:
+                    page_bytes = await metered_to_thread(_read_bytes, page_path)
+                    payload, mime_type, prep = await _prepare_image(page_bytes, ".jpg")
+                    text, confidence = await engine.transcribe(payload, ".jpg", mime_type)
+                except Exception as e:
+                    print(f"OCR failed for page {index + 1}: {e}")
+                    return {"page": index + 1, "text": "", "confidence": 0.0, "cache": "miss", "error": str(e)}
+            if not text.strip():
+                confidence = 0.0
+            if use_cache and text:
+                await metered_to_thread(_ocr_cache.set, key, {"text": text, "confidence": confidence})
+            return {"page": index + 1, "text": text, "confidence": confidence,
+                    "cache": "miss" if use_cache else "bypass", "bytes_sent": prep["sent_bytes"]}
         
-        # Determine MIME type
+        # gather runs each page as its own task; metered keeps their CPU on the OCR stage
+        pages = await asyncio.gather(*(metered(ocr_page(i, path)) for i, path in enumerate(page_paths)))
+    if all("error" in p for p in pages):
+        raise RuntimeError(f"OCR failed for all {len(pages)} pages: {pages[0]['error']}")
+    return list(pages)
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _prepare_image(file_content: bytes, ext: str) -> Tuple[bytes, Optional[str], Dict]:
+    """Run local preprocessing off the event loop; PDFs and disabled preprocessing pass through."""
+    if ext == ".pdf" or not settings.OCR_PREPROCESS:
+        return file_content, None, {"original_bytes": len(file_content), "sent_bytes": len(file_content), "preprocessed": False}
+    payload, mime_type, meta = await metered_to_thread(preprocess_image, file_content)
+    return payload, mime_type or None, meta
+
+async def _cloud_ocr(file_content: bytes, ext: str, mime_type: Optional[str] = None) -> str:
+    base64_content = base64.b64encode(file_content).decode('utf-8')
+    
+    # Determine MIME type
+    if mime_type is None:
         mime_type = "image/jpeg"
         if ext == ".png": mime_type = "image/png"
         elif ext == ".pdf": mime_type = "application/pdf"
         elif ext == ".tiff": mime_type = "image/tiff"
-        
-        # Call Gemini via OpenRouter
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://medclare.app",
-                    "X-Title": "MEDCLARE OCR"
-                },
-                json={
-                    "model": "google/gemini-2.0-flash-001",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": "Transcribe all text from this medical report exactly as it appears. Maintain the tables, test names, values, units, and reference ranges. Do not add any interpretations or summaries. Output only the transcribed text."
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:{mime_type};base64,{base64_content}"
-                                    }
-                                }
-                            ]
+    
+    # Call Gemini via OpenRouter over the shared connection pool
+    data = await openrouter_chat("ocr", {
+        "model": OCR_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": OCR_PROMPT},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{base64_content}"
                         }
-                    ],
-                    "temperature": 0.0,
-                    "max_tokens": 4000
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            ocr_text = data["choices"][0]["message"]["content"]
-            
-            # Use a default high confidence for Gemini Vision
-            return ocr_text, 0.95
-            
-    except Exception as e:
-        print(f"Cloud OCR failed: {e}")
-        # Fallback to simulated OCR for demo continuity if cloud fails
-        return _simulated_ocr(file_path)
+                    }
+                ]
+            }
+        ],
+        "temperature": 0.0,
+        "max_tokens": 4000
+    }, title="MEDCLARE OCR")
+    return data["choices"][0]["message"]["content"]
 
 def _simulated_ocr(file_path: str) -> Tuple[str, float]:
     """Generate realistic sample blood report OCR text for demonstration."""
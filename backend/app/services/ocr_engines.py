@@ -0,0 +1,107 @@
+"""OCR Engines — pluggable text recognisers behind perform_ocr (cloud vision, local Tesseract)."""
+import io
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from app.config import settings
+from app.services.metrics import metered_in_process
+
+class OCREngine(ABC):
+    """
+    One way of turning a single image (or PDF) into text. perform_ocr owns caching, page
+    splitting and preprocessing; engines only transcribe.
+    """
+    name = "base"
+
+    def signature(self) -> Tuple:
+        """Identifies the engine configuration in cache keys and OCR checkpoints."""
+        return (self.name,)
+
+    @abstractmethod
+    async def transcribe(self, content: bytes, ext: str, mime_type: Optional[str] = None) -> Tuple[str, float]:
+        """Returns (text, confidence) for the whole file."""
+
+_engines: Dict[str, OCREngine] = {}
+
+def register_ocr_engine(engine: OCREngine):
+    _engines[engine.name] = engine
+
+def get_ocr_engine(name: str) -> OCREngine:
+    if name not in _engines:
+        raise ValueError(f"Unknown OCR engine '{name}'. Available: {sorted(_engines)}")
+    return _engines[name]
+
+# ── Local Tesseract ──
+
+def _tesseract_transcribe(content: bytes, ext: str, lang: str) -> Tuple[str, float]:
+    """Runs in a worker process: decode, recognise, and average Tesseract's word confidences."""
+    import pytesseract
+    from PIL import Image, ImageSequence
+
+    if ext == ".pdf":
+        from pdf2image import convert_from_bytes
+        images = convert_from_bytes(content, dpi=settings.OCR_PDF_DPI)
+    else:
+        # Every frame of a multi-page TIFF is a page
+        images = [frame.copy() for frame in ImageSequence.Iterator(Image.open(io.BytesIO(content)))]
+
+    texts, confidences = [], []
+    for image in images:
+        data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+        confidences += [float(c) for c, word in zip(data["conf"], data["text"]) if word.strip() and float(c) >= 0]
+        texts.append(pytesseract.image_to_string(image, lang=lang))
+    text = "\n\n".join(t.strip() for t in texts if t.strip())
+    confidence = round(sum(confidences) / len(confidences) / 100, 3) if confidences else 0.0
+    return text, confidence
+
+# Bump whenever transcription changes so cached Tesseract output stops matching
+TESSERACT_ENGINE_VERSION = "2"
+
+def _tesseract_version() -> str:
+    import pytesseract
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except pytesseract.TesseractNotFoundError as e:
+        # pytesseract's exception cannot be unpickled and would break the pool on the way back
+        raise RuntimeError(str(e)) from None
+
+class TesseractEngine(OCREngine):
+    """
+    CPU OCR with no network dependency. Recognition runs in a process pool so several pages
+    or reports are transcribed in parallel without blocking the event loop.
+    """
+    name = "tesseract"
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._version: Optional[str] = None
+
+    def signature(self) -> Tuple:
+        return (self.name, TESSERACT_ENGINE_VERSION, settings.TESSERACT_LANG)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=max(1, settings.OCR_LOCAL_WORKERS))
+        return self._pool
+
+    async def transcribe(self, content: bytes, ext: str, mime_type: Optional[str] = None) -> Tuple[str, float]:
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        if self._version is None:
+            # Fails fast (ImportError / TesseractNotFoundError) when the binary is not installed
+            self._version = await loop.run_in_executor(pool, _tesseract_version)
+        return await metered_in_process(pool, _tesseract_transcribe, content, ext, settings.TESSERACT_LANG)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+register_ocr_engine(TesseractEngine())
+
+def shutdown_ocr_engines():
+    """Stop local worker processes. Called from the app lifespan."""
+    for engine in _engines.values():
+        if hasattr(engine, "shutdown"):
+            engine.shutdown()
@@ -1,148 +1,326 @@
 """AI Orchestration Layer — coordinates the deterministic pipeline."""
 import json
+import asyncio
 from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models import Report, StructuredFinding, ExplanationVersion, AuditLog
-from app.services.ocr import perform_ocr
-from app.services.extraction import extract_findings
-from app.services.rag import retrieve_evidence
+from sqlalchemy.orm.attributes import flag_modified
+from app.config import settings
+from app.database import async_engine
+from app.models import Report, StructuredFinding, Medication, ExplanationVersion, AuditLog
+from app.services.cache import content_hash
+from app.services.ocr import perform_ocr_with_meta, ocr_signature
+from app.services.extraction import extract_findings, EXTRACTION_VERSION
+from app.services.rag import retrieve_evidence, retrieval_signature
 from app.services.explanation import generate_explanation
 from app.services.guardrails import check_guardrails
-from app.services.personalization import personalize_explanation
+from app.services.personalization import personalize_variants
 from app.services.confidence import aggregate_confidence
+from app.services.trends import commit_report_series
+from app.services.stage_graph import StageGraph
+from app.services.events import publish
+from app.services.metrics import metered_to_thread
 
-async def run_pipeline(report_id: str, personalization_level: str, db: Session, lang: str = "en") -> Report:
+def _fingerprint(*parts) -> str:
+    """Hash of a stage's inputs; a checkpoint is reusable only while this matches."""
+    return content_hash(*parts)
+
+def _checkpoint_valid(checkpoints: dict, stage: str, fingerprint: str) -> bool:
+    return (checkpoints.get(stage) or {}).get("input") == fingerprint
+
+# Stages whose outputs depend only on the file bytes (and settings captured in their
+# fingerprints), so an identical upload can inherit them
+_CONTENT_STAGES = ("ocr", "classification", "extraction", "retrieval")
+
+def link_duplicate(db: Session, report: Report, source: Report):
+    """
+    Seed a freshly uploaded report with the OCR and extraction of an earlier report with the
+    same bytes. The copied checkpoints make run_pipeline skip straight to explanation.
+    Does not commit.
+    """
+    report.duplicate_of = source.id
+    report.ocr_text = source.ocr_text
+    report.ocr_confidence = source.ocr_confidence
+    report.report_type = source.report_type
+    report.extraction_json = source.extraction_json
+    source_checkpoints = source.pipeline_checkpoints or {}
+    # Copied as-is: the OCR fingerprint covers the file hash (identical here) and the OCR
+    # signature the source was transcribed with, so a transcription made under an older engine
+    # or preprocessing setup stays stale. Simulated OCR is never checkpointed.
+    report.pipeline_checkpoints = {
+        stage: source_checkpoints[stage] for stage in _CONTENT_STAGES if stage in source_checkpoints
+    }
+
+    for f in source.findings:
+        report.findings.append(StructuredFinding(
+            test_name=f.test_name, value=f.value, unit=f.unit, reference_range=f.reference_range,
+            status=f.status, category=f.category, confidence=f.confidence
+        ))
+    for m in source.medications:
+        report.medications.append(Medication(
+            name=m.name, dosage=m.dosage, frequency=m.frequency, duration=m.duration, instructions=m.instructions
+        ))
+
+async def _mark_progress(report_id: str, status: str):
+    """
+    Publish pipeline progress to pollers in its own short transaction, so the pipeline's results
+    can still be written as a single unit of work at the end.
+    """
+    async with async_engine.begin() as conn:
+        await conn.execute(update(Report).where(Report.id == report_id).values(status=status))
+
+def _finding_rows(report_id: str, findings: List[Dict]) -> List[Dict]:
+    return [
+        dict(
+            report_id=report_id,
+            test_name=f["test_name"],
+            value=f.get("value") or "",
+            unit=f.get("unit", ""),
+            reference_range=f.get("reference_range", ""),
+            status=f.get("status") or "unknown",
+            category=f.get("category", "General"),
+            confidence=f.get("confidence", 0.5)
+        )
+        # Skip findings with no test_name (NOT NULL constraint)
+        for f in findings if f.get("test_name")
+    ]
+
+def _medication_rows(report_id: str, medications: List[Dict]) -> List[Dict]:
+    return [
+        dict(
+            report_id=report_id,
+            name=m["name"],
+            dosage=m.get("dosage"),
+            frequency=m.get("frequency"),
+            duration=m.get("duration"),
+            instructions=m.get("instructions")
+        )
+        for m in medications
+    ]
+
+async def _replace_extraction_rows(db: AsyncSession, report_id: str, branch: str, items: List[Dict]):
+    """Swap the report's finding or medication rows: one DELETE and one batched INSERT."""
+    if branch == "prescription":
+        model, rows = Medication, _medication_rows(report_id, items)
+    else:
+        model, rows = StructuredFinding, _finding_rows(report_id, items)
+    await db.execute(delete(model).where(model.report_id == report_id))
+    if rows:
+        # A list of parameter sets is sent as one multi-row INSERT (executemany)
+        await db.execute(insert(model), rows)
+
+async def run_pipeline(report_id: str, personalization_level: str, db: AsyncSession, lang: str = "en", force: bool = False) -> Report:
     """
     Execute the full deterministic interpretation pipeline:
     1. OCR → 2. Extraction → 3. Retrieval → 4. Explanation → 5. Guardrails → 6. Personalization → 7. Confidence
+
+    OCR, classification, extraction and retrieval are checkpointed on the report and only rerun
+    when their inputs change, so switching lang starts at explanation. Every personalization level
+    is derived from the one explanation and stored in explanation_variants; personalization_level
+    only picks the variant shown, and switching it later needs no pipeline run.
+    Pass force=True to ignore all checkpoints.
+
+    All database I/O goes through the AsyncSession, so a slow commit never stalls the event loop.
+    Results are written in one transaction at the end; status changes in between are published
+    separately by _mark_progress, and the patient's trend series by commit_report_series.
     """
-    report = db.query(Report).filter(Report.id == report_id).first()
+    report = await db.get(Report, report_id)
     if not report:
         raise ValueError(f"Report {report_id} not found")
     
     reasoning_trace = {"pipeline_start": datetime.utcnow().isoformat(), "stages": []}
+    graph = StageGraph()
+    checkpoints = {} if force else dict(report.pipeline_checkpoints or {})
+    # Finding/medication rows for a fresh extraction, written with the final unit of work
+    pending_rows = None
+    
+    def record_stage(entry: Dict):
+        reasoning_trace["stages"].append(entry)
+        publish(report_id, "stage", entry)
+    
+    def explanation_partial(kind: str, value):
+        # Summary deltas and finished sections reach SSE clients long before the stage completes
+        publish(report_id, f"explanation_{kind}", {"delta": value} if kind == "summary" else value)
     
     try:
         # ── Stage 1: OCR ──
-        report.status = "processing"
-        db.commit()
-        
-        ocr_text, ocr_confidence = await perform_ocr(report.file_path)
-        report.ocr_text = ocr_text
-        report.ocr_confidence = ocr_confidence
-        reasoning_trace["stages"].append({
-            "stage": "ocr", "confidence": ocr_confidence,
-            "text_length": len(ocr_text), "timestamp": datetime.utcnow().isoformat()
+        await _mark_progress(report_id, "processing")
+        
+        async def ocr_stage():
+            ocr_fp = _fingerprint(report.file_hash or report.file_path, *ocr_signature())
+            if report.ocr_text and _checkpoint_valid(checkpoints, "ocr", ocr_fp):
+                record_stage({
+                    "stage": "ocr", "confidence": report.ocr_confidence, "text_length": len(report.ocr_text),
+                    "reused": True, "reason": "checkpoint matches file and OCR prompt version",
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+                return report.ocr_text, report.ocr_confidence or 0.95
+            text, confidence, ocr_meta = await perform_ocr_with_meta(report.file_path, file_hash=report.file_hash)
+            report.ocr_text = text
+            report.ocr_confidence = confidence
+            # Simulated text, fallback-engine output and partial page transcriptions are not reusable checkpoints
+            if ocr_meta["source"] != "simulated" and not ocr_meta.get("fallback") and not ocr_meta.get("failed_pages"):
+                checkpoints["ocr"] = {"input": ocr_fp}
+            else:
+                checkpoints.pop("ocr", None)
+            record_stage({
+                "stage": "ocr", "confidence": confidence,
+                "text_length": len(text), "cache": ocr_meta["cache"], "source": ocr_meta["source"],
+                "pages": ocr_meta.get("pages"), "failed_pages": ocr_meta.get("failed_pages"),
+                "bytes_sent": ocr_meta.get("bytes_sent"),
+                "fallback": ocr_meta.get("fallback", False),
+                "reused": False, "timestamp": datetime.utcnow().isoformat()
+            })
+            return text, confidence
+        
+        ocr_text, ocr_confidence = await graph.run("ocr", ocr_stage)
+        
+        # ── Stage 2: Classification + Extraction ──
+        from app.services.extraction import (
+            classify_document_type, extract_lab_report, extract_prescription,
+            lab_extraction_needs_llm, record_extraction, record_speculative_discard
+        )
+        extractors = {"lab_report": extract_lab_report, "prescription": extract_prescription}
+        
+        classify_fp = _fingerprint(ocr_text)
+        classification_reused = bool(report.report_type) and _checkpoint_valid(checkpoints, "classification", classify_fp)
+        # When the type must be re-derived, both extractors start alongside the classifier
+        # and the branch the classifier rules out is cancelled. That only pays off when the lab
+        # branch needs the LLM; a locally extracted lab report would just add a wasted
+        # prescription call to every upload.
+        speculate = (settings.SPECULATIVE_EXTRACTION and not classification_reused
+                     and lab_extraction_needs_llm(ocr_text))
+        if classification_reused:
+            graph.add("classification", lambda *_: report.report_type, deps=("ocr",))
+        else:
+            graph.add("classification", lambda *_: classify_document_type(ocr_text), deps=("ocr",))
+            if speculate:
+                for branch, extractor in extractors.items():
+                    graph.add(f"extraction:{branch}", lambda *_, fn=extractor: fn(ocr_text), deps=("ocr",))
+        
+        report.report_type = await graph.result("classification")
+        if not classification_reused:
+            checkpoints["classification"] = {"input": classify_fp}
+        record_stage({
+            "stage": "classification", "type": report.report_type, "reused": classification_reused,
+            "timestamp": datetime.utcnow().isoformat()
         })
         
-        # ── Stage 2: Extraction ──
-        from app.services.extraction import classify_document_type, extract_lab_report_ai, extract_prescription_ai
+        branch = "prescription" if report.report_type == "prescription" else "lab_report"
+        extraction_node = f"extraction:{branch}"
+        extraction_fp = _fingerprint(ocr_text, report.report_type, EXTRACTION_VERSION)
+        extraction_reused = (not speculate and report.extraction_json is not None
+                             and _checkpoint_valid(checkpoints, "extraction", extraction_fp))
         
-        report.report_type = await classify_document_type(ocr_text)
-        db.commit()
+        if speculate:
+            for other in extractors:
+                if other != branch:
+                    graph.cancel(f"extraction:{other}")
+            record_speculative_discard(len(extractors) - 1)
+        elif extraction_reused:
+            graph.add(extraction_node, lambda *_: (list(report.extraction_json), {"method": "checkpoint"}), deps=("classification",))
+        else:
+            graph.add(extraction_node, lambda *_: extractors[branch](ocr_text), deps=("classification",))
+        items, extraction_meta = await graph.result(extraction_node)
         
         findings_data = []
         med_data = []
         
-        if report.report_type == "prescription":
-            med_data = await extract_prescription_ai(ocr_text)
-            report.extraction_json = med_data
-            
-            from app.models import Medication
-            db.query(Medication).filter(Medication.report_id == report.id).delete()
-            for m in med_data:
-                med = Medication(
-                    report_id=report.id,
-                    name=m["name"],
-                    dosage=m.get("dosage"),
-                    frequency=m.get("frequency"),
-                    duration=m.get("duration"),
-                    instructions=m.get("instructions")
-                )
-                db.add(med)
+        if branch == "prescription":
+            med_data = items
         else:
-            findings_data = await extract_lab_report_ai(ocr_text)
-            report.extraction_json = findings_data
-            
-            db.query(StructuredFinding).filter(StructuredFinding.report_id == report.id).delete()
-            for f in findings_data:
-                # Skip findings with no test_name (NOT NULL constraint)
-                if not f.get("test_name"):
-                    continue
-                finding = StructuredFinding(
-                    report_id=report.id,
-                    test_name=f["test_name"],
-                    value=f.get("value") or "",
-                    unit=f.get("unit", ""),
-                    reference_range=f.get("reference_range", ""),
-                    status=f.get("status") or "unknown",
-                    category=f.get("category", "General"),
-                    confidence=f.get("confidence", 0.5)
-                )
-                db.add(finding)
-        
-        report.status = "extracted"
-        db.commit()
-        
-        reasoning_trace["stages"].append({
+            findings_data = items
+        
+        # Reused extractions keep their stored rows, which already mirror extraction_json
+        if not extraction_reused:
+            record_extraction(branch, extraction_meta)
+            report.extraction_json = items
+            pending_rows = (branch, items)
+            checkpoints["extraction"] = {"input": extraction_fp}
+        
+        record_stage({
             "stage": "extraction", "type": report.report_type,
-            "items_count": len(report.extraction_json),
+            "items_count": len(items),
+            "reused": extraction_reused,
+            **extraction_meta,
+            "speculative": speculate,
             "timestamp": datetime.utcnow().isoformat()
         })
         
-        # ── Stage 3: RAG Retrieval ──
+        # ── Stage 3: RAG Retrieval (runs while the progress update is in flight) ──
         abnormal_findings = [f for f in findings_data if (f.get("status") or "unknown") in ("high", "low", "critical")]
-        evidence = retrieve_evidence(abnormal_findings)
+        # Re-seeding the knowledge base or changing top_k must invalidate stored evidence
+        retrieval_fp = _fingerprint(abnormal_findings, *retrieval_signature())
+        retrieval_reused = _checkpoint_valid(checkpoints, "retrieval", retrieval_fp)
+        if retrieval_reused:
+            graph.add("retrieval", lambda *_: checkpoints["retrieval"].get("evidence", []), deps=(extraction_node,))
+        else:
+            # Chroma's query path is synchronous, so it runs on the default thread pool
+            graph.add("retrieval", lambda *_: metered_to_thread(retrieve_evidence, abnormal_findings), deps=(extraction_node,))
+        graph.add("progress", lambda *_: _mark_progress(report_id, "extracted"), deps=(extraction_node,))
+        evidence, _ = await asyncio.gather(graph.result("retrieval"), graph.result("progress"))
+        
+        if not retrieval_reused:
+            checkpoints["retrieval"] = {"input": retrieval_fp, "evidence": evidence}
         report.citations = evidence
+        report.pipeline_checkpoints = checkpoints
         
-        reasoning_trace["stages"].append({
+        record_stage({
             "stage": "retrieval", "evidence_count": len(evidence),
             "avg_relevance": round(sum((e.get("relevance_score") or 0) for e in evidence) / len(evidence), 3) if evidence else 0,
+            "reused": retrieval_reused,
             "timestamp": datetime.utcnow().isoformat()
         })
         
         # ── Stage 4: Explanation Generation ──
         current_meds = med_data if report.report_type == "prescription" else []
-        explanation_result = await generate_explanation(
-            findings_data, evidence, report.ocr_text, personalization_level,
-            medications=current_meds, lang=lang
-        )
+        explanation_result = await graph.run("explanation", lambda *_: generate_explanation(
+            findings_data, evidence, ocr_text,
+            medications=current_meds, lang=lang, use_cache=not force, on_partial=explanation_partial
+        ), deps=("retrieval",))
         
-        reasoning_trace["stages"].append({
+        record_stage({
             "stage": "explanation", "model": explanation_result.get("model_used", "unknown"),
             "sections_count": len(explanation_result.get("sections", [])),
+            "cache": explanation_result.get("cache"),
+            "first_token_ms": explanation_result.get("first_token_ms"),
             "timestamp": datetime.utcnow().isoformat()
         })
         
         # ── Stage 5: Guardrails ──
-        guardrail_result = check_guardrails(explanation_result)
+        guardrail_result = await graph.run("guardrail", lambda *_: check_guardrails(explanation_result), deps=("explanation",))
         report.guardrail_flags = guardrail_result.get("guardrail_flags", [])
         
-        reasoning_trace["stages"].append({
+        record_stage({
             "stage": "guardrail", "passed": guardrail_result.get("guardrail_passed", False),
             "flags_count": len(guardrail_result.get("guardrail_flags", [])),
             "timestamp": datetime.utcnow().isoformat()
         })
         
-        # ── Stage 6: Personalization ──
-        personalized = personalize_explanation(guardrail_result, personalization_level)
+        # ── Stage 6 + 7: Personalization and Confidence Aggregation (independent) ──
+        # Confidence only reads guardrail flags, so it runs before personalization rewrites the text
+        graph.add("confidence", lambda *_: aggregate_confidence(ocr_confidence, findings_data, evidence, guardrail_result), deps=("guardrail",))
+        graph.add("personalization", lambda *_: personalize_variants(guardrail_result), deps=("guardrail",))
+        confidence, variants = await asyncio.gather(graph.result("confidence"), graph.result("personalization"))
         report.personalization_level = personalization_level
+        report.confidence_scores = confidence
+        report.overall_confidence = confidence["overall"]
         
-        reasoning_trace["stages"].append({
-            "stage": "personalization", "level": personalization_level,
+        record_stage({
+            "stage": "personalization", "level": personalization_level, "variants": list(variants),
             "timestamp": datetime.utcnow().isoformat()
         })
         
-        # ── Stage 7: Confidence Aggregation ──
-        confidence = aggregate_confidence(ocr_confidence, findings_data, evidence, guardrail_result)
-        report.confidence_scores = confidence
-        report.overall_confidence = confidence["overall"]
-        
         # ── Stage 8: Certainty Tagging ──
         from app.services.certainty import tag_certainty
-        personalized = tag_certainty(personalized, confidence)
+        variants = await graph.run("certainty_tagging", lambda *_: {
+            level: tag_certainty(variant, confidence) for level, variant in variants.items()
+        }, deps=("personalization", "confidence"))
+        personalized = variants.get(personalization_level, variants["standard"])
         
-        reasoning_trace["stages"].append({
+        record_stage({
             "stage": "certainty_tagging",
             "timestamp": datetime.utcnow().isoformat()
         })
@@ -150,45 +328,72 @@ async def run_pipeline(report_id: str, personalization_level: str, db: Session,
         # ── Save Results ──
         report.explanation_text = personalized.get("explanation_text", "")
         report.explanation_sections = personalized.get("sections", [])
+        report.explanation_variants = {
+            level: {"explanation_text": variant.get("explanation_text", ""), "sections": variant.get("sections", [])}
+            for level, variant in variants.items()
+        }
         report.citations = personalized.get("citations", [])
         report.lang = lang
         report.status = "explained"
+        # _mark_progress changed the row behind the session's back; when the report was already
+        # explained the ORM sees no change and would leave the row at "extracted"
+        flag_modified(report, "status")
+        reasoning_trace["reused_stages"] = [st["stage"] for st in reasoning_trace["stages"] if st.get("reused")]
+        await graph.drain()
+        reasoning_trace["scheduling"] = graph.critical_path()
         report.reasoning_trace = reasoning_trace
         report.updated_at = datetime.utcnow()
         
-        # Save original version
-        version = ExplanationVersion(
+        # One unit of work: report row, extraction rows, version and audit entry
+        if pending_rows is not None:
+            await _replace_extraction_rows(db, report.id, *pending_rows)
+        await db.execute(insert(ExplanationVersion).values(
             report_id=report.id,
             version=1,
             explanation_text=report.explanation_text,
             explanation_sections=report.explanation_sections,
             edit_type="original"
-        )
-        db.add(version)
-        
-        # Audit log
-        audit = AuditLog(
+        ))
+        await db.execute(insert(AuditLog).values(
             report_id=report.id,
             action="pipeline_complete",
             details={"confidence": confidence["overall"], "findings": len(findings_data)}
-        )
-        db.add(audit)
-        
-        db.commit()
-        db.refresh(report)
+        ))
+        await db.commit()
+        # The patient's trend series are shared with their other reports, so they are updated
+        # in a separate, retried transaction that cannot fail the run
+        if not await db.run_sync(commit_report_series, report, findings_data):
+            await db.refresh(report)
+        publish(report_id, "complete", {"status": report.status, "overall_confidence": report.overall_confidence})
         return report
     
     except Exception as e:
-        db.rollback()
+        graph.cancel_pending()
+        await graph.drain()
+        reasoning_trace["scheduling"] = graph.critical_path()
+        # Keep the stages that finished so a retry resumes from their checkpoints. Extraction
+        # rows were never written, so that checkpoint is dropped and extraction reruns.
+        if pending_rows is not None:
+            checkpoints.pop("extraction", None)
+        resumable = {
+            "ocr_text": report.ocr_text, "ocr_confidence": report.ocr_confidence,
+            "report_type": report.report_type, "pipeline_checkpoints": checkpoints
+        }
+        await db.rollback()
         try:
-            report = db.query(Report).filter(Report.id == report_id).first()
+            report = await db.get(Report, report_id, populate_existing=True)
             if report:
+                for column, value in resumable.items():
+                    setattr(report, column, value)
                 report.status = "error"
                 reasoning_trace["error"] = str(e)
                 report.reasoning_trace = reasoning_trace
-                audit = AuditLog(report_id=report.id, action="pipeline_error", details={"error": str(e)})
-                db.add(audit)
-                db.commit()
+                await db.execute(insert(AuditLog).values(
+                    report_id=report.id, action="pipeline_error", details={"error": str(e)}
+                ))
+                await db.commit()
+                await db.run_sync(commit_report_series, report, [])
         except Exception:
-            db.rollback()
+            await db.rollback()
+        publish(report_id, "error", {"error": str(e)})
         raise e
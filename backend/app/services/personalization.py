@@ -1,6 +1,9 @@
 """Personalization Engine — adapts explanation complexity and tone."""
+import copy
 from typing import Dict, List
 
+PERSONALIZATION_LEVELS = ("simple", "standard", "detailed")
+
 PERSONALIZATION_TEMPLATES = {
     "simple": {
         "prefix": "Here's what your test results mean in simple terms:\n\n",
@@ -32,7 +35,11 @@ PERSONALIZATION_TEMPLATES = {
 }
 
 def personalize_explanation(explanation_result: Dict, level: str = "standard") -> Dict:
-    """Apply personalization to the explanation based on complexity level."""
+    """
+    Apply personalization to the level-agnostic explanation based on complexity level.
+    Each section carries "content" plus optional "clinical_detail" and "plain_summary"; the level
+    picks which of them make up the section text, so no level needs another LLM call.
+    """
     template = PERSONALIZATION_TEMPLATES.get(level, PERSONALIZATION_TEMPLATES["standard"])
     
     explanation_result["personalization_applied"] = {
@@ -43,18 +50,31 @@ def personalize_explanation(explanation_result: Dict, level: str = "standard") -
     # Adjust section content based on level
     sections = explanation_result.get("sections", [])
     for section in sections:
+        content = section.get("content", "")
+        plain = section.pop("plain_summary", None)
+        detail = section.pop("clinical_detail", None)
         if level == "simple":
-            # Simplify language
-            content = section.get("content", "")
-            content = _simplify_text(content)
-            section["content"] = content
+            # Simplify language, preferring the plain-language restatement
+            content = _simplify_text(plain or content)
+        elif level == "detailed" and detail:
+            content = f"{content.rstrip()}\n\n{detail}"
+        section["content"] = content
     
     # Add personalized prefix/closing to summary
     summary = explanation_result.get("explanation_text", "")
+    if level == "simple":
+        summary = _simplify_text(summary)
     explanation_result["explanation_text"] = template["prefix"] + summary + template["closing"]
     
     return explanation_result
 
+def personalize_variants(explanation_result: Dict) -> Dict[str, Dict]:
+    """Every personalization level of one explanation; each variant is an independent copy."""
+    return {
+        level: personalize_explanation(copy.deepcopy(explanation_result), level)
+        for level in PERSONALIZATION_LEVELS
+    }
+
 def _simplify_text(text: str) -> str:
     """Replace medical jargon with simpler terms."""
     replacements = {
@@ -1,36 +1,105 @@
 """RAG Retrieval Engine — semantic + keyword medical knowledge retrieval."""
-import os
-from typing import List, Dict
+import json
+import time
+import hashlib
+import threading
+from collections import deque
+from typing import List, Dict, Tuple
+from app.config import settings
+from app.services.cache import TTLLRUCache
+from app.services.extraction import canonical_test_name
 
 # Global collection reference
 _collection = None
+_collection_lock = threading.Lock()
+
+# Evidence per finding signature; cleared whenever the knowledge index is re-seeded
+_retrieval_cache = TTLLRUCache(settings.RETRIEVAL_CACHE_SIZE, settings.RETRIEVAL_CACHE_TTL)
+_index_generation = 0
+_retrieval_latency = deque(maxlen=1000)
+
+# Bump to force every document to be re-embedded (e.g. after changing the embedding model)
+KNOWLEDGE_VERSION = "1"
+DEFAULT_TOP_K = 5
 
 def _get_collection():
     global _collection
     if _collection is not None:
         return _collection
-    try:
-        import chromadb
-        from app.config import settings
-        client = chromadb.Client()
-        _collection = client.get_or_create_collection(
-            name="medical_knowledge",
-            metadata={"hnsw:space": "cosine"}
-        )
-        if _collection.count() == 0:
-            _seed_knowledge(_collection)
-        return _collection
-    except Exception as e:
-        print(f"ChromaDB init failed: {e}. Using fallback retrieval.")
-        return None
+    # Retrieval runs on worker threads, so only one of them may open and seed the index
+    with _collection_lock:
+        if _collection is not None:
+            return _collection
+        try:
+            import chromadb
+            client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+            collection = client.get_or_create_collection(
+                name="medical_knowledge",
+                metadata={"hnsw:space": "cosine"}
+            )
+            _sync_knowledge(collection)
+            _collection = collection
+            return _collection
+        except Exception as e:
+            print(f"ChromaDB init failed: {e}. Using fallback retrieval.")
+            return None
 
-def _seed_knowledge(collection):
-    """Seed the vector DB with curated medical knowledge."""
+def _doc_id(doc: Dict) -> str:
+    """Content-addressed id: unchanged documents keep their id and their stored embedding."""
+    payload = json.dumps([KNOWLEDGE_VERSION, doc["category"], doc["source"], doc["content"]], ensure_ascii=False)
+    return "kb_" + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+def _sync_knowledge(collection) -> Dict:
+    """
+    Bring the on-disk index in line with the curated knowledge base.
+    Only documents whose content hash is new are embedded; stale ones are deleted.
+    """
     knowledge = _get_knowledge_base()
-    ids = [f"doc_{i}" for i in range(len(knowledge))]
-    documents = [k["content"] for k in knowledge]
-    metadatas = [{"category": k["category"], "source": k["source"]} for k in knowledge]
-    collection.add(ids=ids, documents=documents, metadatas=metadatas)
+    desired = {_doc_id(k): k for k in knowledge}
+    existing = set(collection.get(include=[])["ids"]) if collection.count() else set()
+
+    to_add = [doc_id for doc_id in desired if doc_id not in existing]
+    to_delete = [doc_id for doc_id in existing if doc_id not in desired]
+    if to_delete:
+        collection.delete(ids=to_delete)
+    if to_add or to_delete:
+        invalidate_retrieval_cache()
+    if to_add:
+        collection.add(
+            ids=to_add,
+            documents=[desired[i]["content"] for i in to_add],
+            metadatas=[{"category": desired[i]["category"], "source": desired[i]["source"],
+                        "kb_version": KNOWLEDGE_VERSION} for i in to_add]
+        )
+    return {"added": len(to_add), "deleted": len(to_delete), "unchanged": len(desired) - len(to_add)}
+
+def retrieval_signature(top_k: int = DEFAULT_TOP_K) -> Tuple:
+    """
+    Knowledge base content and query settings that determine the evidence for a set of findings.
+    Unlike the in-process index generation this is stable across restarts, so it can key
+    persisted results such as the pipeline's retrieval checkpoint.
+    """
+    doc_ids = sorted(_doc_id(k) for k in _get_knowledge_base())
+    return (KNOWLEDGE_VERSION, hashlib.sha256("".join(doc_ids).encode("utf-8")).hexdigest()[:16], top_k)
+
+def invalidate_retrieval_cache():
+    """Drop cached evidence; called whenever the knowledge index changes."""
+    global _index_generation
+    _index_generation += 1
+    _retrieval_cache.clear()
+
+def warm_knowledge_index() -> bool:
+    """Open the persistent index, re-seed changed documents and load the embedding model."""
+    collection = _get_collection()
+    if collection is None:
+        return False
+    try:
+        # First query loads the embedding model; pay that cost at startup, not on a user's report
+        collection.query(query_texts=["hemoglobin low clinical significance"], n_results=1)
+        return True
+    except Exception as e:
+        print(f"ChromaDB warm-up query failed: {e}")
+        return False
 
 def _get_knowledge_base() -> List[Dict]:
     """Curated medical reference knowledge."""
@@ -69,52 +138,119 @@ def _get_knowledge_base() -> List[Dict]:
          "content": "When multiple blood parameters are abnormal simultaneously, they often point to interconnected conditions. For example, low hemoglobin with low iron and low ferritin suggests iron-deficiency anemia. Elevated glucose with elevated HbA1c confirms diabetes. Pattern recognition across parameters improves diagnostic accuracy."},
     ]
 
-def retrieve_evidence(abnormal_findings: List[Dict], top_k: int = 5) -> List[Dict]:
+def _value_bucket(value) -> str:
+    """Two significant figures, so 11.2 and 11.4 g/dL share a bucket but 8 and 11 do not."""
+    try:
+        number = float(str(value).strip())
+    except (TypeError, ValueError):
+        return str(value or "").strip().lower()
+    if number == 0:
+        return "0"
+    return f"{float(f'{number:.2g}'):g}"
+
+def finding_signature(finding: Dict) -> tuple:
+    """(canonical test, direction, value bucket, unit) — identical signatures retrieve identical evidence."""
+    direction = "elevated" if finding["status"] in ("high", "critical") else "low"
+    return (
+        canonical_test_name(finding["test_name"]),
+        direction,
+        _value_bucket(finding.get("value")),
+        (finding.get("unit") or "").strip().lower(),
+    )
+
+def _query_text(signature: tuple) -> str:
+    test, direction, bucket, unit = signature
+    return f"{test} {direction} {bucket} {unit} clinical significance"
+
+def retrieve_evidence(abnormal_findings: List[Dict], top_k: int = DEFAULT_TOP_K) -> List[Dict]:
     """Retrieve relevant medical knowledge for abnormal findings."""
     collection = _get_collection()
     
     if not abnormal_findings:
         return []
     
-    # Build queries from abnormal findings
-    queries = []
-    for finding in abnormal_findings:
-        status_word = "elevated" if finding["status"] in ("high", "critical") else "low"
-        query = f"{finding['test_name']} {status_word} {finding['value']} {finding.get('unit', '')} clinical significance"
-        queries.append(query)
-    
+    start = time.perf_counter()
     results = []
     
     if collection is not None:
         try:
-            for query in queries:
-                res = collection.query(query_texts=[query], n_results=min(top_k, 3))
-                if res and res['documents']:
-                    for i, doc in enumerate(res['documents'][0]):
-                        meta = res['metadatas'][0][i] if res['metadatas'] else {}
-                        distance = res['distances'][0][i] if res['distances'] else 0
-                        results.append({
-                            "content": doc,
-                            "source": meta.get("source", "Medical Reference"),
-                            "category": meta.get("category", "General"),
-                            "relevance_score": round(1 - distance, 3) if distance else 0.8
-                        })
+            results = _cached_query(collection, abnormal_findings, top_k)
         except Exception as e:
             print(f"ChromaDB retrieval failed: {e}")
             results = _fallback_retrieval(abnormal_findings)
     else:
         results = _fallback_retrieval(abnormal_findings)
     
-    # Deduplicate and rank
-    seen = set()
-    unique = []
-    for r in sorted(results, key=lambda x: x["relevance_score"], reverse=True):
-        key = r["content"][:100]
-        if key not in seen:
-            seen.add(key)
-            unique.append(r)
+    evidence = _dedupe_ranked(results, top_k)
+    _retrieval_latency.append(time.perf_counter() - start)
+    return evidence
+
+def _cached_query(collection, findings: List[Dict], top_k: int) -> List[Dict]:
+    """Serve known signatures from the cache; embed and search the rest in one batched call."""
+    signatures = list(dict.fromkeys(finding_signature(f) for f in findings))
+    hits_by_sig = {}
+    missing = []
+    for sig in signatures:
+        cached = _retrieval_cache.get(repr(sig))
+        if cached is None:
+            missing.append(sig)
+        else:
+            hits_by_sig[sig] = cached
     
-    return unique[:top_k]
+    if missing:
+        generation = _index_generation
+        res = collection.query(
+            query_texts=[_query_text(sig) for sig in missing],
+            n_results=min(top_k, 3)
+        )
+        for sig, hits in zip(missing, _split_query_results(res)):
+            hits_by_sig[sig] = hits
+            # Skip the write if the index was re-seeded while this query was in flight
+            if generation == _index_generation:
+                _retrieval_cache.set(repr(sig), hits)
+    
+    return [hit for sig in signatures for hit in hits_by_sig[sig]]
+
+def _split_query_results(res: Dict) -> List[List[Dict]]:
+    """Turn a batched Chroma response into one evidence list per query."""
+    if not res or not res.get('documents'):
+        return []
+    metadatas = res.get('metadatas') or []
+    distances = res.get('distances') or []
+    per_query = []
+    for q, docs in enumerate(res['documents']):
+        hits = []
+        for i, doc in enumerate(docs):
+            meta = metadatas[q][i] if metadatas else {}
+            distance = distances[q][i] if distances else 0
+            hits.append({
+                "content": doc,
+                "source": meta.get("source", "Medical Reference"),
+                "category": meta.get("category", "General"),
+                "relevance_score": round(1 - distance, 3) if distance else 0.8
+            })
+        per_query.append(hits)
+    return per_query
+
+def get_retrieval_stats() -> Dict:
+    """Signature-cache hit rate and end-to-end retrieve_evidence latency."""
+    samples = sorted(_retrieval_latency)
+    def pct(p):
+        return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000, 2) if samples else 0.0
+    return {
+        "cache": _retrieval_cache.stats(),
+        "index_generation": _index_generation,
+        "latency_ms": {"count": len(samples), "p50": pct(50), "p95": pct(95), "p99": pct(99)},
+    }
+
+def _dedupe_ranked(results: List[Dict], top_k: int) -> List[Dict]:
+    """Single pass: keep the best-scoring hit per document, then rank."""
+    best: Dict[str, Dict] = {}
+    for r in results:
+        key = r["content"][:100]
+        if key not in best or r["relevance_score"] > best[key]["relevance_score"]:
+            best[key] = r
+    return sorted(best.values(), key=lambda x: x["relevance_score"], reverse=True)[:top_k]
 
 def _fallback_retrieval(findings: List[Dict]) -> List[Dict]:
     """Keyword-based fallback when vector DB is unavailable."""
@@ -0,0 +1,98 @@
+"""Stage Graph — dependency-driven concurrent execution of pipeline stages."""
+import time
+import asyncio
+import inspect
+from typing import Any, Callable, Dict, Iterable, List
+from app.services.metrics import call_metered, metered, stage_timer
+
+class StageGraph:
+    """
+    Each stage starts as soon as all of its dependencies have finished and receives their
+    results as positional arguments. Independent stages therefore overlap on the event loop.
+    Stages can be cancelled (e.g. a losing speculative branch); cancelled stages are excluded
+    from the critical path. Every stage is timed (wall and CPU) and its LLM usage recorded.
+    """
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._deps: Dict[str, tuple] = {}
+        self._spans: Dict[str, Dict[str, float]] = {}
+        self.cancelled: List[str] = []
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = ()) -> asyncio.Task:
+        """Schedule a stage. fn may be sync or async; its args are the dependency results in order."""
+        deps = tuple(deps)
+        self._deps[name] = deps
+
+        async def run():
+            inputs = [await self._tasks[d] for d in deps]
+            start = time.perf_counter()
+            sample: Dict = {}
+            try:
+                with stage_timer(name) as sample:
+                    result = call_metered(fn, *inputs)
+                    if inspect.isawaitable(result):
+                        result = await metered(result)
+                    return result
+            finally:
+                self._spans[name] = {
+                    "start_ms": round((start - self._t0) * 1000, 1),
+                    "end_ms": round((time.perf_counter() - self._t0) * 1000, 1),
+                    **sample,
+                }
+
+        task = asyncio.ensure_future(run())
+        self._tasks[name] = task
+        return task
+
+    async def result(self, name: str) -> Any:
+        return await self._tasks[name]
+
+    async def run(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = ()) -> Any:
+        """Schedule a stage and wait for it."""
+        return await self.add(name, fn, deps)
+
+    def cancel(self, name: str):
+        task = self._tasks.get(name)
+        if task is not None and not task.done():
+            task.cancel()
+            self.cancelled.append(name)
+
+    def cancel_pending(self):
+        for name in list(self._tasks):
+            self.cancel(name)
+
+    async def drain(self):
+        """Wait for every scheduled stage (cancelled ones included) to settle."""
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def critical_path(self) -> Dict:
+        """Longest dependency chain by duration, plus the serial sum for comparison."""
+        durations = {
+            name: span["end_ms"] - span["start_ms"]
+            for name, span in self._spans.items() if name not in self.cancelled
+        }
+        memo: Dict[str, tuple] = {}
+
+        def longest(name: str) -> tuple:
+            if name not in memo:
+                best = (0.0, [])
+                for dep in self._deps.get(name, ()):
+                    if dep in durations:
+                        candidate = longest(dep)
+                        if candidate[0] > best[0]:
+                            best = candidate
+                memo[name] = (best[0] + durations[name], best[1] + [name])
+            return memo[name]
+
+        chains = [longest(name) for name in durations]
+        total, path = max(chains, key=lambda c: c[0]) if chains else (0.0, [])
+        return {
+            "critical_path_ms": round(total, 1),
+            "critical_path": path,
+            "serial_ms": round(sum(durations.values()), 1),
+            "wall_ms": round((time.perf_counter() - self._t0) * 1000, 1),
+            "stages": self._spans,
+            "cancelled": self.cancelled,
+        }
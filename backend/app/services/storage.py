@@ -0,0 +1,138 @@
+"""Upload Storage — content-addressed, reference-counted files streamed in bounded chunks."""
+import os
+import uuid
+import asyncio
+import hashlib
+from typing import Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import StoredFile, Report
+
+# Multipart boundaries, part headers and the small form fields sent next to the file
+_MULTIPART_OVERHEAD = 64 * 1024
+
+class UploadTooLargeError(ValueError):
+    pass
+
+def _too_large_detail() -> str:
+    return f"File exceeds the {settings.MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit"
+
+class RequestSizeLimitMiddleware:
+    """
+    Bound request bodies before Starlette spools them. Multipart forms are parsed into a
+    temporary file before the route runs, so save_upload's own check only fires once an
+    oversized body has already been received. A declared Content-Length past the limit is
+    refused without reading the body; bodies without one are cut off as they stream in.
+    """
+    def __init__(self, app, max_body: Optional[int] = None):
+        self.app = app
+        self.max_body = max_body if max_body is not None else settings.MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_body:
+            await JSONResponse({"detail": _too_large_detail()}, status_code=413)(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body:
+                    # FastAPI re-raises HTTPExceptions from body parsing, so this becomes a 413
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+async def save_upload(file: UploadFile, ext: str) -> Tuple[str, str, int]:
+    """
+    Copy an upload into UPLOAD_DIR without holding more than one chunk in memory.
+    Returns (file_path, sha256_hex, size_bytes). Files are stored under their SHA-256, so
+    identical bytes occupy one file; pair with retain_file to count the reports using it.
+    The upload is written under a temporary name and renamed once complete, so a partial
+    upload is never visible at its final path.
+    Raises UploadTooLargeError (after removing the partial file) past MAX_UPLOAD_BYTES.
+    RequestSizeLimitMiddleware has already bounded the request body, so this check only
+    catches a file that fits the body allowance but not the file limit.
+    """
+    part_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}{ext}.part")
+    sha256 = hashlib.sha256()
+    size = 0
+    out = await asyncio.to_thread(open, part_path, "wb")
+    try:
+        try:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_BYTES:
+                    raise UploadTooLargeError(_too_large_detail())
+                sha256.update(chunk)
+                # Disk writes block; keep them off the event loop
+                await asyncio.to_thread(out.write, chunk)
+        finally:
+            await asyncio.to_thread(out.close)
+        file_hash = sha256.hexdigest()
+        file_path = os.path.join(settings.UPLOAD_DIR, f"{file_hash}{ext}")
+        if os.path.exists(file_path):
+            await asyncio.to_thread(os.remove, part_path)  # already stored
+        else:
+            await asyncio.to_thread(os.replace, part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return file_path, file_hash, size
+
+def retain_file(db: Session, file_hash: str, file_path: str, size: int) -> str:
+    """
+    Count one more report referencing a stored file and return the path reports should use.
+    Does not commit.
+
+    Nothing decrements the count yet: reports are only soft-deleted and can be restored, so
+    their files must stay. A purge of deleted reports would be the place to drop references
+    and remove files whose count reaches zero.
+    """
+    stored = db.query(StoredFile).filter(StoredFile.sha256 == file_hash).first()
+    if stored is None:
+        try:
+            with db.begin_nested():
+                db.add(StoredFile(sha256=file_hash, file_path=file_path, size_bytes=size, ref_count=1))
+            return file_path
+        except IntegrityError:
+            # A concurrent upload of the same bytes registered it first
+            stored = db.query(StoredFile).filter(StoredFile.sha256 == file_hash).first()
+    db.query(StoredFile).filter(StoredFile.sha256 == file_hash).update(
+        {"ref_count": StoredFile.ref_count + 1}, synchronize_session=False
+    )
+    if stored.file_path != file_path and os.path.exists(file_path):
+        # Same bytes uploaded under another extension (.jpg/.jpeg); keep the first copy only
+        os.remove(file_path)
+    return stored.file_path
+
+# A re-upload is often the patient retrying after one of these; it must start from scratch
+_UNTRUSTED_STATUSES = ("rejected", "error")
+
+def find_duplicate_report(db: Session, patient_id: str, file_hash: str) -> Optional[Report]:
+    """
+    Most recent report of this patient with identical bytes whose extraction already finished.
+    Deleted reports, reports a doctor rejected and failed runs are never used as a source.
+    """
+    return (
+        db.query(Report)
+        .filter(Report.patient_id == patient_id, Report.file_hash == file_hash)
+        .filter(Report.extraction_json.isnot(None), Report.ocr_text.isnot(None))
+        .filter(Report.is_deleted == False, Report.status.notin_(_UNTRUSTED_STATUSES))
+        .order_by(Report.created_at.desc())
+        .first()
+    )
@@ -2,99 +2,54 @@
 from typing import Dict, List, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import asc
-from app.models import Report, StructuredFinding
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import asc, distinct, func
+from app.models import Report, StructuredFinding, PatientParameterSeries
+from app.services.extraction import canonical_test_name
+from app.services.metrics import record_retry
+
+
+TREND_STATUSES = ("explained", "verified", "edited")
+# Attempts for a series update that lost a race with another report of the same patient
+SERIES_SYNC_ATTEMPTS = 3
 
 
 def analyze_trends(patient_id: str, current_report_id: str, db: Session) -> Dict:
     """
     Analyze historical trends for a patient's lab parameters across all their reports.
     Returns trend data per parameter with direction, change %, and historical data points.
+    Reads the per-parameter series maintained by sync_report_series, so the cost is
+    O(parameters) rather than O(reports × findings).
     """
-    # Get all reports for this patient, ordered by creation date
-    reports = (
-        db.query(Report)
+    report_count = (
+        db.query(func.count(Report.id))
         .filter(Report.patient_id == patient_id)
         .filter(Report.report_type == "lab_report")
-        .filter(Report.status.in_(["explained", "verified", "edited"]))
-        .order_by(asc(Report.created_at))
-        .all()
+        .filter(Report.status.in_(TREND_STATUSES))
+        .scalar()
     )
 
-    if len(reports) < 2:
+    if report_count < 2:
         return {
             "has_history": False,
-            "report_count": len(reports),
+            "report_count": report_count,
             "trends": [],
             "summary": "Not enough historical reports for trend analysis. Upload more reports to see trends."
         }
 
-    # Collect all findings grouped by test_name across reports
-    parameter_history: Dict[str, List[Dict]] = {}
-
-    for report in reports:
-        findings = (
-            db.query(StructuredFinding)
-            .filter(StructuredFinding.report_id == report.id)
-            .all()
-        )
-        for finding in findings:
-            name = finding.test_name
-            if name not in parameter_history:
-                parameter_history[name] = []
-
-            # Try to parse numeric value
-            numeric_val = _parse_numeric(finding.value)
-
-            parameter_history[name].append({
-                "report_id": report.id,
-                "date": report.created_at.isoformat() if report.created_at else None,
-                "value": finding.value,
-                "numeric_value": numeric_val,
-                "unit": finding.unit or "",
-                "status": finding.status or "unknown",
-                "reference_range": finding.reference_range or "",
-                "is_current": report.id == current_report_id
-            })
-
-    # Compute trends for each parameter
-    trends = []
-    for param_name, data_points in parameter_history.items():
-        if len(data_points) < 2:
-            continue  # Need at least 2 points for a trend
-
-        # Only consider data points with numeric values
-        numeric_points = [dp for dp in data_points if dp["numeric_value"] is not None]
-        if len(numeric_points) < 2:
-            continue
+    series = db.query(PatientParameterSeries).filter(PatientParameterSeries.patient_id == patient_id).all()
+    if _series_incomplete(db, patient_id, series):
+        # Reports processed before the series table existed, or whose series update was lost
+        try:
+            series = rebuild_patient_series(db, patient_id)
+            db.commit()
+        except (StaleDataError, IntegrityError):
+            # A pipeline run wrote the series meanwhile; serve what it wrote
+            db.rollback()
+            series = db.query(PatientParameterSeries).filter(PatientParameterSeries.patient_id == patient_id).all()
 
-        latest = numeric_points[-1]
-        previous = numeric_points[-2]
-
-        # Calculate trend direction and change
-        change_pct = _calculate_change(previous["numeric_value"], latest["numeric_value"])
-        direction = _determine_direction(change_pct)
-
-        # Calculate min, max, average
-        values = [dp["numeric_value"] for dp in numeric_points]
-        avg_val = sum(values) / len(values)
-
-        trends.append({
-            "parameter": param_name,
-            "direction": direction,
-            "change_percent": round(change_pct, 1),
-            "current_value": latest["value"],
-            "previous_value": previous["value"],
-            "unit": latest["unit"],
-            "current_status": latest["status"],
-            "data_points": data_points,
-            "stats": {
-                "min": round(min(values), 2),
-                "max": round(max(values), 2),
-                "average": round(avg_val, 2),
-                "measurement_count": len(numeric_points)
-            }
-        })
+    trends = [t for t in (_trend_from_series(row, current_report_id) for row in series) if t]
 
     # Sort: most significant changes first
     trends.sort(key=lambda t: abs(t["change_percent"]), reverse=True)
@@ -114,7 +69,7 @@ def analyze_trends(patient_id: str, current_report_id: str, db: Session) -> Dict
 
     return {
         "has_history": True,
-        "report_count": len(reports),
+        "report_count": report_count,
         "trends": trends,
         "summary": ". ".join(summary_parts) if summary_parts else "No significant trends detected.",
         "improving_count": len(improving),
@@ -123,6 +78,178 @@ def analyze_trends(patient_id: str, current_report_id: str, db: Session) -> Dict
     }
 
 
+def _series_incomplete(db: Session, patient_id: str, series: List[PatientParameterSeries]) -> bool:
+    """True when a counted report with findings has no point in the patient's series."""
+    with_findings = (
+        db.query(func.count(distinct(Report.id)))
+        .join(StructuredFinding, StructuredFinding.report_id == Report.id)
+        .filter(Report.patient_id == patient_id)
+        .filter(Report.report_type == "lab_report")
+        .filter(Report.status.in_(TREND_STATUSES))
+        .scalar()
+    )
+    represented = {dp["report_id"] for row in series for dp in row.points or []}
+    return len(represented) < with_findings
+
+
+def _trend_from_series(row: PatientParameterSeries, current_report_id: str) -> Optional[Dict]:
+    """Direction and stats for one parameter, from its stored points and aggregates."""
+    points = row.points or []
+    # Need at least 2 numeric points for a trend
+    if len(points) < 2 or row.numeric_count < 2:
+        return None
+
+    numeric_points = [dp for dp in reversed(points) if dp["numeric_value"] is not None][:2]
+    latest, previous = numeric_points[0], numeric_points[1]
+
+    # Calculate trend direction and change
+    change_pct = _calculate_change(previous["numeric_value"], latest["numeric_value"])
+    direction = _determine_direction(change_pct)
+
+    return {
+        "parameter": row.display_name,
+        "direction": direction,
+        "change_percent": round(change_pct, 1),
+        "current_value": latest["value"],
+        "previous_value": previous["value"],
+        "unit": latest["unit"],
+        "current_status": latest["status"],
+        "data_points": [{**dp, "is_current": dp["report_id"] == current_report_id} for dp in points],
+        "stats": {
+            "min": round(row.min_value, 2),
+            "max": round(row.max_value, 2),
+            "average": round(row.sum_value / row.numeric_count, 2),
+            "measurement_count": row.numeric_count
+        }
+    }
+
+
+def _make_point(report_id: str, created_at: Optional[datetime], value, unit, status, reference_range) -> Dict:
+    return {
+        "report_id": report_id,
+        "date": created_at.isoformat() if created_at else None,
+        "value": value,
+        "numeric_value": _parse_numeric(value),
+        "unit": unit or "",
+        "status": status or "unknown",
+        "reference_range": reference_range or "",
+    }
+
+
+def _refresh_aggregates(row: PatientParameterSeries):
+    values = [dp["numeric_value"] for dp in row.points if dp["numeric_value"] is not None]
+    row.numeric_count = len(values)
+    row.min_value = min(values) if values else None
+    row.max_value = max(values) if values else None
+    row.sum_value = sum(values)
+
+
+def sync_report_series(db: Session, report: Report, findings: List[Dict]):
+    """
+    Incrementally update the patient's series with one report's findings.
+    Existing points for the report are replaced; pass findings=[] to drop the report
+    (e.g. when it is rejected or fails). Does not commit.
+    """
+    rows = {
+        r.parameter: r for r in
+        db.query(PatientParameterSeries).filter(PatientParameterSeries.patient_id == report.patient_id).all()
+    }
+
+    new_points: Dict[str, tuple] = {}
+    if report.report_type == "lab_report":
+        for f in findings:
+            if not f.get("test_name"):
+                continue
+            parameter = canonical_test_name(f["test_name"])
+            if parameter and parameter not in new_points:
+                new_points[parameter] = (f["test_name"], _make_point(
+                    report.id, report.created_at, f.get("value") or "", f.get("unit"),
+                    f.get("status"), f.get("reference_range")
+                ))
+
+    for parameter, row in rows.items():
+        if parameter in new_points or not any(dp["report_id"] == report.id for dp in row.points or []):
+            continue
+        row.points = [dp for dp in row.points if dp["report_id"] != report.id]
+        if row.points:
+            _refresh_aggregates(row)
+        else:
+            db.delete(row)
+
+    for parameter, (test_name, point) in new_points.items():
+        row = rows.get(parameter)
+        if row is None:
+            row = PatientParameterSeries(patient_id=report.patient_id, parameter=parameter,
+                                         display_name=test_name, points=[])
+            db.add(row)
+        points = [dp for dp in (row.points or []) if dp["report_id"] != report.id] + [point]
+        points.sort(key=lambda dp: dp["date"] or "")
+        row.points = points
+        if points[-1] is point:
+            row.display_name = test_name
+        _refresh_aggregates(row)
+
+
+def commit_report_series(db: Session, report: Report, findings: List[Dict]) -> bool:
+    """
+    sync_report_series in its own transaction, after the caller has committed its own work.
+    Two reports of one patient finishing together both rewrite the same series rows: the
+    version column turns a lost update into StaleDataError and a parameter added by both into
+    IntegrityError, and either way the update is re-read and retried. If every attempt loses,
+    the report is missing from the series and analyze_trends rebuilds it on the next read.
+    """
+    report_id, patient_id = report.id, report.patient_id
+    for attempt in range(1, SERIES_SYNC_ATTEMPTS + 1):
+        try:
+            sync_report_series(db, report, findings)
+            db.commit()
+            return True
+        except (StaleDataError, IntegrityError) as e:
+            db.rollback()
+            print(f"Series update for report {report_id} conflicted (attempt {attempt}): {type(e).__name__}")
+            if attempt < SERIES_SYNC_ATTEMPTS:
+                record_retry("series_sync")
+    print(f"Series update for report {report_id} gave up; patient {patient_id} will be rebuilt on read")
+    return False
+
+
+def rebuild_patient_series(db: Session, patient_id: str) -> List[PatientParameterSeries]:
+    """Rebuild every series for a patient from one joined report/finding query. Does not commit."""
+    rows = (
+        db.query(
+            Report.id, Report.created_at, StructuredFinding.test_name, StructuredFinding.value,
+            StructuredFinding.unit, StructuredFinding.status, StructuredFinding.reference_range
+        )
+        .join(StructuredFinding, StructuredFinding.report_id == Report.id)
+        .filter(Report.patient_id == patient_id)
+        .filter(Report.report_type == "lab_report")
+        .filter(Report.status.in_(TREND_STATUSES))
+        .order_by(asc(Report.created_at))
+        .all()
+    )
+
+    db.query(PatientParameterSeries).filter(PatientParameterSeries.patient_id == patient_id).delete()
+    series: Dict[str, PatientParameterSeries] = {}
+    for report_id, created_at, test_name, value, unit, status, reference_range in rows:
+        parameter = canonical_test_name(test_name)
+        if not parameter:
+            continue
+        row = series.get(parameter)
+        if row is None:
+            row = series[parameter] = PatientParameterSeries(
+                patient_id=patient_id, parameter=parameter, display_name=test_name, points=[]
+            )
+        if row.points and row.points[-1]["report_id"] == report_id:
+            continue  # one point per report and parameter
+        row.points.append(_make_point(report_id, created_at, value, unit, status, reference_range))
+        row.display_name = test_name
+
+    for row in series.values():
+        _refresh_aggregates(row)
+        db.add(row)
+    return list(series.values())
+
+
 def _parse_numeric(value: str) -> Optional[float]:
     """Try to extract a numeric value from a string."""
     if not value:
@@ -0,0 +1,118 @@
+"""
+Request latency while pipelines commit: sync Session on the event loop vs AsyncSession.
+
+Starts writer tasks that repeatedly store a pipeline-sized reasoning trace and commit, as
+run_pipeline does, while a client sends GET /health to the ASGI app on the same event loop.
+With the sync Session each commit (and its fsync) blocks the loop, so request latency grows
+with the number of writers; with AsyncSession it stays close to the idle baseline.
+Run from the backend directory:
+    python benchmarks/bench_async_db.py [writers] [seconds]
+"""
+import os
+import sys
+import asyncio
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+_tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp.name}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+import httpx
+
+from app.database import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.models import Report, User
+
+# Roughly the size of a reasoning trace with scheduling spans and retrieval evidence
+TRACE = {"stages": [{"stage": f"s{i}", "detail": "x" * 2000} for i in range(60)]}
+
+
+def seed(n_reports: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    patient = User(email="bench@bench", name="Bench", hashed_password="x")
+    db.add(patient)
+    db.flush()
+    reports = [Report(patient_id=patient.id, file_path="x", file_type="pdf") for _ in range(n_reports)]
+    db.add_all(reports)
+    db.commit()
+    ids = [r.id for r in reports]
+    db.close()
+    return ids
+
+
+async def sync_writer(report_id: str, stop: asyncio.Event, commits: list):
+    """The pre-async pipeline: the sync Session commits directly on the event loop."""
+    db = SessionLocal()
+    try:
+        while not stop.is_set():
+            report = db.get(Report, report_id)
+            report.reasoning_trace = {**TRACE, "at": datetime.utcnow().isoformat()}
+            db.commit()
+            commits.append(1)
+            await asyncio.sleep(0)
+    finally:
+        db.close()
+
+
+async def async_writer(report_id: str, stop: asyncio.Event, commits: list):
+    async with AsyncSessionLocal() as db:
+        while not stop.is_set():
+            report = await db.get(Report, report_id)
+            report.reasoning_trace = {**TRACE, "at": datetime.utcnow().isoformat()}
+            await db.commit()
+            commits.append(1)
+
+
+async def measure(writer, report_ids, seconds: float):
+    stop = asyncio.Event()
+    commits: list = []
+    tasks = [asyncio.create_task(writer(rid, stop, commits)) for rid in report_ids] if writer else []
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get("/health")
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+            await asyncio.sleep(0.005)
+    stop.set()
+    await asyncio.gather(*tasks)
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "max": latencies[-1],
+        "commits_per_s": len(commits) / seconds,
+    }
+
+
+async def main(writers: int, seconds: float):
+    report_ids = seed(writers)
+    results = {
+        "idle": await measure(None, report_ids, seconds),
+        "sync Session": await measure(sync_writer, report_ids, seconds),
+        "AsyncSession": await measure(async_writer, report_ids, seconds),
+    }
+    print(f"\nGET /health latency with {writers} pipelines committing ({seconds:.0f}s each)\n")
+    print(f"{'mode':<14}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'commits/s':>12}")
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['requests']:>10}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['max']:>10.2f}{r['commits_per_s']:>12.0f}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    asyncio.run(main(writers, seconds))
+    engine.dispose()
+    os.unlink(_tmp.name)
@@ -0,0 +1,118 @@
+"""
+Micro-benchmark for the deterministic lab extractor.
+
+Compares the precompiled single-pass extract_findings against the previous per-line,
+per-test regex implementation on the sample OCR text and on synthetic multi-page reports,
+and checks both find the same tests and values. Units and ranges are not compared: the
+current extractor reads them from the report, the legacy one always used COMMON_TESTS.
+
+Run from the backend directory:
+    python benchmarks/bench_extraction.py
+"""
+import re
+import sys
+import random
+import timeit
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.extraction import COMMON_TESTS, determine_status, extract_findings
+from app.services.ocr import _simulated_ocr
+
+
+def legacy_extract_findings(ocr_text: str) -> List[Dict]:
+    """The original implementation: one regex compile per (line x test) and a linear duplicate scan."""
+    findings = []
+    lines = ocr_text.split('\n')
+    for line in lines:
+        line_clean = line.strip()
+        if not line_clean:
+            continue
+        for test_key, test_info in COMMON_TESTS.items():
+            pattern = re.compile(
+                rf'({re.escape(test_key)})\s*[:\.\-\|]?\s*(\d+\.?\d*)\s*({re.escape(test_info["unit"])})?',
+                re.IGNORECASE
+            )
+            match = pattern.search(line_clean)
+            if match:
+                value_str = match.group(2)
+                try:
+                    value_num = float(value_str)
+                except ValueError:
+                    continue
+                ref = test_info["ref"]
+                status = determine_status(value_num, ref)
+                already = any(f["test_name"].lower() == test_key.lower() for f in findings)
+                if not already:
+                    findings.append({
+                        "test_name": test_key.upper() if len(test_key) <= 4 else test_key.title(),
+                        "value": value_str,
+                        "unit": test_info["unit"],
+                        "reference_range": ref,
+                        "status": status,
+                        "category": test_info["category"],
+                        "confidence": 0.85
+                    })
+    if not findings:
+        generic_pattern = re.compile(
+            r'([A-Za-z][A-Za-z\s\.]{2,30}?)\s*[:\.\-\|]+\s*(\d+\.?\d*)\s*([A-Za-z/%]+)?\s*(?:[\(\[]?\s*(\d+\.?\d*\s*[-–]\s*\d+\.?\d*)\s*[\)\]]?)?'
+        )
+        for line in lines:
+            for m in generic_pattern.findall(line):
+                value = m[1]
+                ref = m[3] if m[3] else ""
+                findings.append({
+                    "test_name": m[0].strip().title(),
+                    "value": value,
+                    "unit": m[2] if m[2] else "",
+                    "reference_range": ref if ref else "N/A",
+                    "status": determine_status(float(value), ref) if ref else "normal",
+                    "category": "General",
+                    "confidence": 0.6
+                })
+    return findings
+
+
+def synthetic_report(pages: int, lines_per_page: int = 60, seed: int = 7) -> str:
+    """Multi-page lab bundle: headers, narrative noise and known tests in mixed case."""
+    rng = random.Random(seed)
+    keys = list(COMMON_TESTS)
+    noise = [
+        "Sample collected at 08:30 AM, processed by automated analyser",
+        "Comments: Please correlate clinically.",
+        "Page footer - Laboratory accreditation no. 4471",
+        "",
+    ]
+    out = []
+    for page in range(pages):
+        out.append(f"LABORATORY REPORT  Page {page + 1} of {pages}")
+        for _ in range(lines_per_page):
+            if rng.random() < 0.4:
+                out.append(rng.choice(noise))
+            else:
+                key = rng.choice(keys)
+                name = key.upper() if rng.random() < 0.5 else key.title()
+                value = round(rng.uniform(0.5, 300), 1)
+                out.append(f"{name}: {value} {COMMON_TESTS[key]['unit']} ({COMMON_TESTS[key]['ref']})")
+    return "\n".join(out)
+
+
+def matched(findings: List[Dict]) -> List[tuple]:
+    return [(f["test_name"], f["value"]) for f in findings]
+
+
+def bench(label: str, text: str, repeat: int):
+    assert matched(extract_findings(text)) == matched(legacy_extract_findings(text)), f"{label}: outputs differ"
+    legacy = min(timeit.repeat(lambda: legacy_extract_findings(text), number=repeat, repeat=3)) / repeat
+    current = min(timeit.repeat(lambda: extract_findings(text), number=repeat, repeat=3)) / repeat
+    print(f"{label:<28} {len(text.splitlines()):>6} lines  legacy {legacy * 1000:9.2f} ms  "
+          f"single-pass {current * 1000:8.3f} ms  speedup {legacy / current:6.1f}x")
+
+
+if __name__ == "__main__":
+    sample, _ = _simulated_ocr("sample.png")
+    bench("sample OCR text", sample, repeat=50)
+    for pages in (1, 10, 50):
+        bench(f"synthetic {pages}-page report", synthetic_report(pages), repeat=3 if pages == 50 else 10)
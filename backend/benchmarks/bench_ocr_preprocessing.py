@@ -0,0 +1,68 @@
+"""
+Bytes sent to the vision model and end-to-end OCR time, with and without local preprocessing.
+
+Runs every image in evaluation_dataset/ through app.services.preprocessing. With
+OPENROUTER_API_KEY set it also transcribes both payloads and reports latency and how similar
+the two transcriptions are; without a key only the local stage and payload sizes are measured.
+Run from the backend directory:
+    python benchmarks/bench_ocr_preprocessing.py
+"""
+import sys
+import time
+import asyncio
+import base64
+import difflib
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings
+from app.services.ocr import _cloud_ocr
+from app.services.preprocessing import preprocess_image
+
+DATASET = Path(__file__).resolve().parent.parent.parent / "evaluation_dataset"
+
+
+async def transcribe(payload: bytes, ext: str, mime_type=None):
+    start = time.perf_counter()
+    text = await _cloud_ocr(payload, ext, mime_type)
+    return text, time.perf_counter() - start
+
+
+async def main():
+    online = bool(settings.OPENROUTER_API_KEY)
+    files = sorted(p for p in DATASET.iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png", ".tiff"))
+    print(f"{'file':<24} | {'raw b64':>9} | {'sent b64':>9} | {'saved':>6} | {'prep ms':>7}"
+          + (f" | {'raw s':>6} | {'prep s':>6} | {'similar':>7}" if online else ""))
+    print("-" * (66 + (28 if online else 0)))
+    totals = {"raw": 0, "sent": 0, "prep": 0.0, "raw_s": 0.0, "sent_s": 0.0}
+    for path in files:
+        raw = path.read_bytes()
+        start = time.perf_counter()
+        payload, mime_type, meta = preprocess_image(raw)
+        prep_s = time.perf_counter() - start
+        raw_b64, sent_b64 = len(base64.b64encode(raw)), len(base64.b64encode(payload))
+        totals["raw"] += raw_b64
+        totals["sent"] += sent_b64
+        totals["prep"] += prep_s
+        row = (f"{path.name[:24]:<24} | {raw_b64:>9} | {sent_b64:>9} | {1 - sent_b64 / raw_b64:>6.0%} | "
+               f"{prep_s * 1000:>7.0f}")
+        if online:
+            raw_text, raw_s = await transcribe(raw, path.suffix.lower())
+            sent_text, sent_s = await transcribe(payload, path.suffix.lower(), mime_type or None)
+            totals["raw_s"] += raw_s
+            totals["sent_s"] += prep_s + sent_s
+            similarity = difflib.SequenceMatcher(None, raw_text, sent_text).ratio()
+            row += f" | {raw_s:>6.2f} | {prep_s + sent_s:>6.2f} | {similarity:>7.2f}"
+        print(row)
+
+    print(f"\nTotal base64 payload: {totals['raw']:,} -> {totals['sent']:,} bytes "
+          f"({1 - totals['sent'] / totals['raw']:.0%} smaller), preprocessing {totals['prep'] * 1000:.0f} ms")
+    if online:
+        print(f"Total OCR time: {totals['raw_s']:.2f}s raw vs {totals['sent_s']:.2f}s preprocessed (incl. local stage)")
+    else:
+        print("OPENROUTER_API_KEY not set; skipped the vision calls.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
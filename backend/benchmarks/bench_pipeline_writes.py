@@ -0,0 +1,120 @@
+"""
+Database round-trips and commits for one pipeline run over a large lab panel.
+
+Runs run_pipeline on a throwaway SQLite database with OCR, classification, extraction,
+retrieval and explanation replaced by canned results, and counts the statements and commits
+it issues. The finding rows must go out in a single INSERT however large the panel is.
+Run from the backend directory:
+    python benchmarks/bench_pipeline_writes.py [rows]
+"""
+import os
+import sys
+import asyncio
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+_tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp.name}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import event
+
+from app.database import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from app.models import Report, StructuredFinding, User
+from app.services import extraction, orchestrator
+
+_statements = Counter()
+_commits = []
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    verb = statement.split(None, 1)[0].upper()
+    table = statement.split(" INTO ")[1].split()[0] if verb == "INSERT" else ""
+    _statements[f"{verb} {table}".strip()] += 1
+
+
+@event.listens_for(async_engine.sync_engine, "commit")
+def _commit(conn):
+    _commits.append(1)
+
+
+def panel(rows: int):
+    return [
+        {"test_name": f"Analyte {i}", "value": str(i % 17), "unit": "mg/dL", "reference_range": "1-10",
+         "status": "high" if i % 17 > 10 else "normal", "category": "Chemistry", "confidence": 0.9}
+        for i in range(rows)
+    ]
+
+
+async def run(report_id: str, findings):
+    async def ocr(*_args, **_kwargs):
+        return "LAB REPORT", 0.95, {"source": "cloud", "cache": "miss"}
+
+    async def classify(_text):
+        return "lab_report"
+
+    async def extract(_text):
+        return findings, {"method": "benchmark"}
+
+    async def explain(findings_data, *_args, **_kwargs):
+        return {"explanation_text": "ok", "sections": [{"title": "Summary", "content": "ok"}], "model_used": "bench"}
+
+    with mock.patch.object(orchestrator, "perform_ocr_with_meta", ocr), \
+            mock.patch.object(orchestrator, "retrieve_evidence", lambda _f: []), \
+            mock.patch.object(orchestrator, "generate_explanation", explain), \
+            mock.patch.object(extraction, "classify_document_type", classify), \
+            mock.patch.object(extraction, "extract_lab_report", extract), \
+            mock.patch.object(extraction, "extract_prescription", extract):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            await orchestrator.run_pipeline(report_id, "standard", db, force=True)
+            return (time.perf_counter() - start) * 1000
+
+
+async def main(rows: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    patient = User(email="bench@bench", name="Bench", hashed_password="x")
+    db.add(patient)
+    db.flush()
+    report = Report(patient_id=patient.id, file_path="x", file_type="pdf", file_hash="bench")
+    db.add(report)
+    db.commit()
+    report_id = report.id
+    db.close()
+
+    findings = panel(rows)
+    await run(report_id, findings)  # warm-up: imports, connection pool, first series rows
+    _statements.clear()
+    _commits.clear()
+    elapsed = await run(report_id, findings)
+
+    print(f"\nPipeline run with a {rows}-row panel: {elapsed:.1f} ms, "
+          f"{sum(_statements.values())} statements, {len(_commits)} commits\n")
+    for statement, count in sorted(_statements.items()):
+        print(f"  {count:>4}  {statement}")
+
+    db = SessionLocal()
+    stored = db.query(StructuredFinding).filter(StructuredFinding.report_id == report_id).count()
+    status = db.get(Report, report_id).status
+    db.close()
+    assert stored == rows, stored
+    # The measured run reprocesses an explained report, which must not be left at "extracted"
+    assert status == "explained", status
+    assert _statements["INSERT structured_findings"] == 1, "findings were not written in one batch"
+    # Two progress updates, the final unit of work and the trend series update
+    assert len(_commits) == 4, len(_commits)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    asyncio.run(main(n))
+    engine.dispose()
+    os.unlink(_tmp.name)
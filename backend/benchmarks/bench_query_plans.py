@@ -0,0 +1,127 @@
+"""
+Query plans and timings for the hot report/job queries, before and after the index migrations.
+
+Builds a throwaway SQLite database shaped like one created before the indexes existed
+(tables only, no secondary indexes), seeds it, prints EXPLAIN QUERY PLAN and median latency
+for each query, then upgrades it with app.migrations.run_migrations and measures again.
+Run from the backend directory:
+    python benchmarks/bench_query_plans.py [reports]
+"""
+import os
+import sys
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+_tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp.name}"
+
+from sqlalchemy import func, inspect, text
+
+from app.database import Base, SessionLocal, engine
+from app.migrations import MIGRATIONS, run_migrations
+from app.models import (AuditLog, ExplanationVersion, Medication, PipelineJob, Report,
+                        StructuredFinding, User)
+
+
+def legacy_schema():
+    """Tables as create_all builds them, minus every index the migrations add."""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table in inspect(conn).get_table_names():
+            for index in inspect(conn).get_indexes(table):
+                if index["name"] != "ix_users_email" and not index.get("unique"):
+                    conn.execute(text(f"DROP INDEX {index['name']}"))
+        conn.execute(text("DELETE FROM schema_migrations"))
+
+
+def seed(n_reports: int):
+    rng = random.Random(7)
+    db = SessionLocal()
+    patients = [User(email=f"p{i}@bench", name=f"Patient {i}", hashed_password="x") for i in range(n_reports // 20)]
+    db.add_all(patients)
+    db.flush()
+    t0 = datetime(2024, 1, 1)
+    rows = []
+    for i in range(n_reports):
+        report_id = f"r{i:07d}"
+        rows.append(dict(id=report_id, patient_id=patients[i % len(patients)].id, file_path="x", file_type="pdf",
+                         status=rng.choice(["explained", "verified", "error", "uploaded"]),
+                         report_type=rng.choice(["lab_report", "lab_report", "prescription"]),
+                         review_requested=rng.random() < 0.1, is_deleted=rng.random() < 0.05,
+                         created_at=t0 + timedelta(minutes=i)))
+    db.bulk_insert_mappings(Report, rows)
+    db.bulk_insert_mappings(StructuredFinding, [
+        dict(report_id=r["id"], test_name=f"Test {k}", value="1.0") for r in rows for k in range(5)])
+    db.bulk_insert_mappings(Medication, [dict(report_id=r["id"], name="Paracetamol") for r in rows])
+    db.bulk_insert_mappings(ExplanationVersion, [dict(report_id=r["id"], explanation_text="x") for r in rows])
+    db.bulk_insert_mappings(AuditLog, [dict(report_id=r["id"], action="pipeline_complete") for r in rows])
+    db.bulk_insert_mappings(PipelineJob, [
+        dict(report_id=r["id"], status=rng.choice(["completed"] * 20 + ["queued"]), priority=rng.choice([0, 0, 10]),
+             created_at=r["created_at"]) for r in rows])
+    patient_id = patients[0].id
+    db.commit()
+    db.close()
+    return patient_id, rows[len(rows) // 2]["id"]
+
+
+def hot_queries(patient_id: str, report_id: str):
+    """The statements behind list_reports, analyze_trends, report detail loading and the job queue."""
+    db = SessionLocal()
+    queries = {
+        "patient feed": db.query(Report.id).filter(Report.patient_id == patient_id, Report.is_deleted == False)
+            .order_by(Report.created_at.desc(), Report.id.desc()).limit(50),
+        "doctor queue": db.query(Report.id).filter(Report.review_requested == True, Report.is_deleted == False)
+            .order_by(Report.created_at.desc(), Report.id.desc()).limit(50),
+        "trend count": db.query(func.count(Report.id)).filter(
+            Report.patient_id == patient_id, Report.report_type == "lab_report",
+            Report.status.in_(("explained", "verified", "edited"))),
+        "report findings": db.query(StructuredFinding).filter(StructuredFinding.report_id == report_id),
+        "report medications": db.query(Medication).filter(Medication.report_id == report_id),
+        "report versions": db.query(ExplanationVersion).filter(ExplanationVersion.report_id == report_id)
+            .order_by(ExplanationVersion.version.desc()),
+        "job claim": db.query(PipelineJob.id).filter(PipelineJob.status == "queued")
+            .order_by(PipelineJob.priority.desc(), PipelineJob.created_at.asc()).limit(1),
+        "job dedupe": db.query(PipelineJob.id).filter(
+            PipelineJob.report_id == report_id, PipelineJob.status.in_(("queued", "running"))),
+    }
+    db.close()
+    return {name: str(q.statement.compile(engine, compile_kwargs={"literal_binds": True})) for name, q in queries.items()}
+
+
+def measure(sql: str, repeat: int = 20):
+    with engine.connect() as conn:
+        plan = " / ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(text(sql)).all()
+            samples.append(time.perf_counter() - start)
+    return plan, statistics.median(samples) * 1000
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    legacy_schema()
+    queries = hot_queries(*seed(n))
+
+    before = {name: measure(sql) for name, sql in queries.items()}
+    start = time.perf_counter()
+    applied = run_migrations(engine)
+    print(f"\nMigrations {applied} applied to {n} reports in {time.perf_counter() - start:.2f}s\n")
+    after = {name: measure(sql) for name, sql in queries.items()}
+
+    for name in queries:
+        print(f"{name}: {before[name][1]:.2f} ms -> {after[name][1]:.2f} ms")
+        print(f"    before: {before[name][0]}")
+        print(f"    after:  {after[name][0]}")
+
+    assert run_migrations(engine) == [], "migrations are not idempotent"
+    assert len(applied) == len(MIGRATIONS)
+    engine.dispose()
+    os.unlink(_tmp.name)
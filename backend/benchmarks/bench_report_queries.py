@@ -0,0 +1,123 @@
+"""
+SQL round-trips for the report list and detail endpoints as the review queue grows.
+
+Seeds a throwaway SQLite database, calls the router functions directly and counts the
+statements they execute. The eager-loaded endpoints must stay constant in the number of
+reports; the previous lazy-loading list is shown for comparison. Run from the backend directory:
+    python benchmarks/bench_report_queries.py
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+_tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp.name}"
+
+from fastapi import Response
+from sqlalchemy import event
+
+from app.database import Base, SessionLocal, engine
+from app.models import Medication, Report, StructuredFinding, User
+from app.routers.reports import get_report, list_reports as _list_reports
+from app.schemas import ReportListOut, ReportOut
+
+_statements = []
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    _statements.append(statement)
+
+
+def list_reports(user, db, **filters):
+    """All pages of the paginated endpoint, as one list."""
+    rows, cursor = [], None
+    while True:
+        response = Response()
+        page_filters = {"status": None, "report_type": None, "verification_status": None,
+                        "created_from": None, "created_to": None, **filters}
+        rows += _list_reports(response, limit=5000, cursor=cursor, user=user, db=db, **page_filters)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return rows
+
+
+def legacy_doctor_list(db):
+    """The previous implementation: full Report rows plus one lazy patient load per row."""
+    reports = db.query(Report).filter(Report.is_deleted == False, Report.review_requested == True).order_by(Report.created_at.desc()).all()
+    result = []
+    for r in reports:
+        out = ReportListOut.model_validate(r)
+        out.patient_name = r.patient.name if r.patient else "Unknown"
+        result.append(out)
+    return result
+
+
+def legacy_detail(db, report_id):
+    return ReportOut.model_validate(db.query(Report).filter(Report.id == report_id).first())
+
+
+def seed(db, n_reports: int):
+    doctor = User(email="doctor@bench", name="Doctor", hashed_password="x", role="doctor")
+    db.add(doctor)
+    patients = [User(email=f"p{i}@bench", name=f"Patient {i}", hashed_password="x") for i in range(max(1, n_reports // 3))]
+    db.add_all(patients)
+    db.flush()
+    for i in range(n_reports):
+        report = Report(patient_id=patients[i % len(patients)].id, file_path="x", file_type="pdf",
+                        status="explained", review_requested=True)
+        db.add(report)
+        db.flush()
+        db.add_all([StructuredFinding(report_id=report.id, test_name=f"Test {k}", value="1.0") for k in range(5)])
+        db.add(Medication(report_id=report.id, name="Paracetamol"))
+    db.commit()
+    return doctor, patients[0]
+
+
+def measure(fn, *args):
+    db = SessionLocal()
+    try:
+        _statements.clear()
+        start = time.perf_counter()
+        fn(*args, db)
+        return len(_statements), (time.perf_counter() - start) * 1000
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print(f"{'reports':>8} | {'endpoint':<18} | {'legacy q':>8} | {'new q':>6} | {'legacy ms':>9} | {'new ms':>7}")
+    print("-" * 72)
+    for n in (10, 100, 1000):
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        doctor, patient = seed(db, n)
+        report_id = db.query(Report.id).filter(Report.patient_id == patient.id).first()[0]
+        db.refresh(doctor)
+        db.refresh(patient)
+        db.close()
+
+        cases = [
+            ("doctor list", lambda db: legacy_doctor_list(db), lambda db: list_reports(doctor, db)),
+            ("detail", lambda db: legacy_detail(db, report_id), lambda db: get_report(report_id, doctor, db)),
+        ]
+        for name, legacy, new in cases:
+            legacy_q, legacy_ms = measure(legacy)
+            new_q, new_ms = measure(new)
+            print(f"{n:>8} | {name:<18} | {legacy_q:>8} | {new_q:>6} | {legacy_ms:>9.1f} | {new_ms:>7.1f}")
+
+        patient_q, _ = measure(lambda db: list_reports(patient, db))
+        assert patient_q == 1, f"patient list used {patient_q} queries"
+        assert measure(lambda db: list_reports(doctor, db))[0] == 1, "doctor list is not a single query"
+        assert measure(lambda db: get_report(report_id, doctor, db))[0] == 2, "detail query count changed"
+        db = SessionLocal()
+        assert legacy_doctor_list(db) == list_reports(doctor, db), "doctor list output differs"
+        db.close()
+
+    engine.dispose()
+    os.unlink(_tmp.name)
@@ -0,0 +1,75 @@
+"""
+Benchmark for knowledge retrieval: one collection.query per finding vs. one batched query.
+
+Uses the persistent knowledge index (and its embedding model) exactly as the pipeline does,
+so the numbers include embedding time. Run from the backend directory:
+    python benchmarks/bench_retrieval.py
+"""
+import sys
+import time
+import random
+import statistics
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.extraction import COMMON_TESTS
+from app.services import rag
+
+
+def _build_query(finding: Dict) -> str:
+    return rag._query_text(rag.finding_signature(finding))
+
+
+def _flatten_query_results(res: Dict) -> List[Dict]:
+    return [hit for hits in rag._split_query_results(res) for hit in hits]
+
+
+def per_query_retrieve(collection, findings: List[Dict], top_k: int = 5) -> List[Dict]:
+    """The previous implementation: one embedding + search round-trip per finding."""
+    results = []
+    for finding in findings:
+        res = collection.query(query_texts=[_build_query(finding)], n_results=min(top_k, 3))
+        results.extend(_flatten_query_results(res))
+    return rag._dedupe_ranked(results, top_k)
+
+
+def batched_retrieve(collection, findings: List[Dict], top_k: int = 5) -> List[Dict]:
+    res = collection.query(query_texts=[_build_query(f) for f in findings], n_results=min(top_k, 3))
+    return rag._dedupe_ranked(_flatten_query_results(res), top_k)
+
+
+def abnormal_findings(n: int, seed: int = 3) -> List[Dict]:
+    rng = random.Random(seed)
+    keys = list(COMMON_TESTS)
+    return [{
+        "test_name": key.title(),
+        "value": str(round(rng.uniform(1, 300), 1)),
+        "unit": COMMON_TESTS[key]["unit"],
+        "status": rng.choice(["high", "low", "critical"]),
+    } for key in (rng.choice(keys) for _ in range(n))]
+
+
+def timed(fn, *args, repeat: int = 5) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+if __name__ == "__main__":
+    collection = rag._get_collection()
+    if collection is None:
+        sys.exit("Knowledge index unavailable (see ChromaDB error above); nothing to benchmark.")
+    rag.warm_knowledge_index()
+
+    print(f"{'findings':>8}  {'per-query ms':>12}  {'batched ms':>10}  {'speedup':>7}")
+    for n in (1, 5, 10, 15, 25, 50):
+        findings = abnormal_findings(n)
+        assert per_query_retrieve(collection, findings) == batched_retrieve(collection, findings)
+        loop_ms = timed(per_query_retrieve, collection, findings)
+        batch_ms = timed(batched_retrieve, collection, findings)
+        print(f"{n:>8}  {loop_ms:>12.1f}  {batch_ms:>10.1f}  {loop_ms / batch_ms:>6.1f}x")
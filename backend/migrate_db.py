@@ -1,20 +1,12 @@
-import sqlite3
-import os
+"""Apply pending schema migrations to the configured database.
 
-db_path = os.path.join(os.getcwd(), 'medclare.db')
-print(f"Connecting to {db_path}...")
+The API runs the same migrations at startup; this script is for upgrading a database
+ahead of a deploy. Run from the backend directory:
+    python migrate_db.py
+"""
+from app.database import engine
+from app.migrations import run_migrations
 
-try:
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("ALTER TABLE reports ADD COLUMN lang VARCHAR DEFAULT 'en'")
-    conn.commit()
-    print("Column 'lang' added successfully.")
-except sqlite3.OperationalError as e:
-    if "duplicate column name" in str(e).lower():
-        print("Column 'lang' already exists.")
-    else:
-        print(f"Error: {e}")
-finally:
-    if conn:
-        conn.close()
+print(f"Connecting to {engine.url}...")
+applied = run_migrations(engine)
+print(f"Applied migrations: {applied}" if applied else "Database schema is up to date.")
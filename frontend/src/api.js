@@ -29,10 +29,72 @@ export const uploadReport = (file, title) => {
     });
 };
 
-export const listReports = () => api.get('/reports/');
+// Paginated newest-first; pass { cursor } from the X-Next-Cursor response header for the next page
+export const listReports = (params = {}) => api.get('/reports/', { params });
 export const getReport = (id) => api.get(`/reports/${id}`);
-export const processReport = (id, level = 'standard', lang = 'en') =>
-    api.post(`/reports/${id}/process`, { personalization_level: level, lang });
+// Processing runs as a background job; poll it and resolve with the finished report
+export const getJob = (jobId) => api.get(`/jobs/${jobId}`);
+
+// Server-Sent Events for a job. EventSource cannot send the Authorization header, so the
+// stream is read with fetch. Calls onEvent(event, data) per frame; resolves with the last job status.
+export const streamJobEvents = async (jobId, onEvent) => {
+    const token = localStorage.getItem('medclare_token');
+    const res = await fetch(`${API_BASE}/jobs/${jobId}/events`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {}
+    });
+    if (!res.ok || !res.body) throw new Error(`Event stream unavailable (${res.status})`);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let last = null;
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            if (!data) continue;  // keep-alive comment
+            const payload = JSON.parse(data);
+            if (event === 'job') last = payload;
+            onEvent?.(event, payload);
+        }
+    }
+    return last;
+};
+
+// Pass onEvent to receive stage progress and the explanation as it is written; falls back to polling
+export const processReport = async (id, level = 'standard', lang = 'en', priority = 0, onEvent = null) => {
+    const { data: job } = await api.post(`/reports/${id}/process`, { personalization_level: level, lang, priority });
+    let current = job;
+    if (onEvent) {
+        try {
+            current = (await streamJobEvents(job.id, onEvent)) || current;
+        } catch (e) {
+            console.warn('Job event stream failed, polling instead', e);
+        }
+    }
+    while (current.status === 'queued' || current.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1500));
+        current = (await getJob(job.id)).data;
+    }
+    if (current.status === 'failed') {
+        const err = new Error(current.error || 'Processing failed');
+        err.response = { data: { detail: current.error || 'Processing failed' } };
+        throw err;
+    }
+    return getReport(id);
+};
+// Swaps in the stored variant for another level; 409 when the report needs processing again
+export const setPersonalizationLevel = (id, level) =>
+    api.put(`/reports/${id}/personalization`, { personalization_level: level });
 export const deleteReport = (id) => api.delete(`/reports/${id}`);
 export const restoreReport = (id) => api.post(`/reports/${id}/restore`);
 export const requestReview = (id, note) => api.post(`/reports/${id}/request-review`, { note });
@@ -50,7 +112,7 @@ export const getReportTrends = (id) => api.get(`/reports/${id}/trends`);
 // Evaluation
 export const runEvaluation = (reportId, goldStandard) =>
     api.post(`/evaluation/run/${reportId}`, { gold_standard: goldStandard || null });
-export const getEvaluationBenchmark = () => api.get('/evaluation/benchmark');
+export const getEvaluationBenchmark = (params = {}) => api.get('/evaluation/benchmark', { params });
 export const getReportEvaluations = (reportId) => api.get(`/evaluation/${reportId}`);
 
 export default api;
@@ -12,10 +12,14 @@ export default function Dashboard() {
     const [deletingId, setDeletingId] = useState(null);
     const [undoTimer, setUndoTimer] = useState(null);
     const [countdown, setCountdown] = useState(10);
-
-    const fetchReports = () => {
-        listReports()
-            .then(res => setReports(res.data))
+    const [nextCursor, setNextCursor] = useState(null);
+
+    const fetchReports = (cursor = null) => {
+        listReports(cursor ? { cursor } : {})
+            .then(res => {
+                setReports(prev => cursor ? [...prev, ...res.data] : res.data);
+                setNextCursor(res.headers['x-next-cursor'] || null);
+            })
             .catch(console.error)
             .finally(() => setLoading(false));
     };
@@ -165,6 +169,14 @@ export default function Dashboard() {
                     </div>
                 )}
 
+                {nextCursor && (
+                    <div style={{ textAlign: 'center', marginTop: 'var(--space-4)' }}>
+                        <button onClick={() => fetchReports(nextCursor)} className="btn btn-ghost">
+                            Load more
+                        </button>
+                    </div>
+                )}
+
                 {deletingId && (
                     <div className="undo-toast">
                         <div className="undo-toast-content">
@@ -3,6 +3,8 @@ import { Link } from 'react-router-dom';
 import { listReports, runEvaluation, getEvaluationBenchmark } from '../api';
 import { useTranslation } from 'react-i18next';
 
+const EVALUABLE_STATUSES = 'explained,verified,edited';
+
 function ScoreCard({ label, value, icon, color }) {
     const pct = Math.round(value * 100);
     return (
@@ -45,16 +47,18 @@ export default function Evaluation() {
     const [result, setResult] = useState(null);
     const [loading, setLoading] = useState(false);
     const [pageLoading, setPageLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
+
+    const fetchReports = (cursor = null) =>
+        listReports(cursor ? { status: EVALUABLE_STATUSES, cursor } : { status: EVALUABLE_STATUSES })
+            .then(res => {
+                setReports(prev => cursor ? [...prev, ...res.data] : res.data);
+                setNextCursor(res.headers['x-next-cursor'] || null);
+            });
 
     useEffect(() => {
-        Promise.all([listReports(), getEvaluationBenchmark()])
-            .then(([rRes, bRes]) => {
-                const processedReports = rRes.data.filter(r =>
-                    ['explained', 'verified', 'edited'].includes(r.status)
-                );
-                setReports(processedReports);
-                setBenchmark(bRes.data);
-            })
+        Promise.all([fetchReports(), getEvaluationBenchmark()])
+            .then(([, bRes]) => setBenchmark(bRes.data))
             .catch(console.error)
             .finally(() => setPageLoading(false));
     }, []);
@@ -107,6 +111,16 @@ export default function Evaluation() {
                                 </option>
                             ))}
                         </select>
+                        {nextCursor && (
+                            <button
+                                type="button"
+                                onClick={() => fetchReports(nextCursor).catch(console.error)}
+                                className="btn btn-ghost"
+                                style={{ marginTop: 'var(--space-2)' }}
+                            >
+                                Load more reports
+                            </button>
+                        )}
                     </div>
                     <div className="input-group" style={{ marginBottom: 'var(--space-4)' }}>
                         <label>Gold Standard Reference (Optional)</label>
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useParams, Link } from 'react-router-dom';
-import { getReport, processReport, getReportTrends, requestReview } from '../api';
+import { getReport, processReport, getReportTrends, requestReview, setPersonalizationLevel } from '../api';
 import { useAuth } from '../context/AuthContext';
 import { useTranslation } from 'react-i18next';
 
@@ -649,6 +649,30 @@ export default function ReportView() {
         }
     };
 
+    const handleLevelChange = async (level) => {
+        setReprocessing(true);
+        try {
+            const res = await setPersonalizationLevel(id, level);
+            setReport(res.data);
+        } catch (err) {
+            // Regenerating would overwrite a doctor's edit or review, so only older reports fall back
+            const reviewed = report.verification_status || ['edited', 'verified'].includes(report.status);
+            if (err.response?.status !== 409 || reviewed) {
+                alert(err.response?.data?.detail || t('common.error'));
+                return;
+            }
+            // No stored variant (explained before variants existed): regenerate at the new level
+            try {
+                const res = await processReport(id, level, report.lang || i18n.language);
+                setReport(res.data);
+            } catch (e) {
+                alert(e.response?.data?.detail || t('common.error'));
+            }
+        } finally {
+            setReprocessing(false);
+        }
+    };
+
     if (loading) return <div className="loading-spinner"><div className="spinner" /></div>;
     if (error) return (
         <div className="page"><div className="container">
@@ -692,6 +716,20 @@ export default function ReportView() {
                             {report.ocr_confidence && (
                                 <span className="report-meta-item">🔍 {t('upload.pipeline.ocr')}: {Math.round(report.ocr_confidence * 100)}%</span>
                             )}
+                            {report.explanation_text && (
+                                <select
+                                    className="input-field"
+                                    aria-label={t('upload.detailLevel')}
+                                    value={report.personalization_level}
+                                    onChange={e => handleLevelChange(e.target.value)}
+                                    disabled={reprocessing}
+                                    style={{ width: 'auto', fontSize: 'var(--fs-xs)', padding: '0.25rem 0.5rem' }}
+                                >
+                                    <option value="simple">{t('upload.levels.simple')}</option>
+                                    <option value="standard">{t('upload.levels.standard')}</option>
+                                    <option value="detailed">{t('upload.levels.detailed')}</option>
+                                </select>
+                            )}
                         </div>
                     </div>
                 </div>
@@ -11,6 +11,7 @@ export default function Upload() {
     const [dragover, setDragover] = useState(false);
     const [processing, setProcessing] = useState(false);
     const [currentStage, setCurrentStage] = useState(-1);
+    const [preview, setPreview] = useState('');
     const [error, setError] = useState('');
     const fileRef = useRef();
     const navigate = useNavigate();
@@ -26,6 +27,23 @@ export default function Upload() {
         { key: 'complete', label: t('upload.pipeline.complete'), icon: '✓' }
     ];
 
+    // Pipeline stage finished → index of the PIPELINE_STAGES entry that is now active
+    const STAGE_PROGRESS = {
+        ocr: 2, classification: 2, extraction: 3, retrieval: 4,
+        explanation: 5, guardrail: 6, personalization: 6, certainty_tagging: 7
+    };
+
+    const handleJobEvent = (event, data) => {
+        if (event === 'stage' && STAGE_PROGRESS[data.stage] !== undefined) {
+            setCurrentStage(prev => Math.max(prev, STAGE_PROGRESS[data.stage]));
+        } else if (event === 'explanation_summary') {
+            setCurrentStage(prev => Math.max(prev, 4));
+            setPreview(prev => prev + data.delta);
+        } else if (event === 'explanation_reset') {
+            setPreview('');
+        }
+    };
+
     const handleFile = (f) => {
         const allowed = ['.pdf', '.png', '.jpg', '.jpeg', '.tiff'];
         const ext = f.name.substring(f.name.lastIndexOf('.')).toLowerCase();
@@ -54,17 +72,10 @@ export default function Upload() {
             const uploadRes = await uploadReport(file, title);
             const reportId = uploadRes.data.id;
 
-            // Stage 2-7: Processing pipeline
+            // Stage 2-7: Processing pipeline, advanced by the job's event stream
             setCurrentStage(1);
-            const timer = setInterval(() => {
-                setCurrentStage(prev => {
-                    if (prev >= 6) { clearInterval(timer); return prev; }
-                    return prev + 1;
-                });
-            }, 1500);
-
-            const result = await processReport(reportId, level, i18n.language);
-            clearInterval(timer);
+            setPreview('');
+            await processReport(reportId, level, i18n.language, 0, handleJobEvent);
             setCurrentStage(7);
 
             setTimeout(() => navigate(`/report/${reportId}`), 1200);
@@ -158,6 +169,12 @@ export default function Upload() {
                                 </div>
                             </div>
                         ))}
+                        {preview && (
+                            <p style={{
+                                marginTop: 'var(--space-6)', color: 'var(--color-text-secondary)',
+                                fontSize: 'var(--fs-sm)', lineHeight: 1.6
+                            }}>{preview}</p>
+                        )}
                         {error && (
                             <div style={{
                                 marginTop: 'var(--space-4)', padding: '0.75rem 1rem',